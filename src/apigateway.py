@@ -0,0 +1,137 @@
+import gzip
+import json
+import base64
+import hashlib
+import serializer
+
+# Optional brotli support, used when it is installed in the package
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+# Smaller bodies are not worth the CPU and the base64 overhead
+MIN_COMPRESS_SIZE = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def header(event, name):
+    # API Gateway keeps the case used by the client
+    name = name.lower()
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def request_json(event):
+    # With binary media types enabled, request bodies may come in base64
+    body = event['body']
+    if event.get('isBase64Encoded'):
+        body = base64.b64decode(body).decode('utf-8')
+    return json.loads(body)
+
+
+def _stamp(item):
+    # The version changes on every update, updatedAt (items created before
+    # versioning) may repeat within a millisecond
+    if 'version' in item:
+        return 'v%s' % item['version']
+    return item.get('updatedAt')
+
+
+def etag(items, variant=''):
+    # Strong ETag from the ids, versions and languages of the items,
+    # without serializing them. None if the items were projected without
+    # them.
+    digest = hashlib.sha256(variant.encode('utf-8'))
+    for item in items:
+        if 'id' not in item or _stamp(item) is None:
+            return None
+        digest.update(('\n%s:%s:%s' % (item['id'], _stamp(item),
+                                       item.get('lang', ''))).encode('utf-8'))
+    return '"%s"' % digest.hexdigest()[:32]
+
+
+def item_etag(item):
+    # A single todo is tagged with its version, the value update.update
+    # expects in If-Match, plus the detected language ("3-es"): storing it
+    # does not change the version but changes the representation
+    if 'version' not in item:
+        return None
+    if item.get('lang'):
+        return '"%s-%s"' % (item['version'], item['lang'])
+    return '"%s"' % item['version']
+
+
+def _body_etag(body):
+    return '"%s"' % hashlib.sha256(body.encode('utf-8')).hexdigest()[:32]
+
+
+def _not_modified(event, tag):
+    value = header(event, 'If-None-Match')
+    if not value:
+        return False
+    # If-None-Match uses the weak comparison
+    tags = [t.strip() for t in value.split(',')]
+    return '*' in tags or tag in [t[2:] if t.startswith('W/') else t
+                                  for t in tags]
+
+
+def _accepted(value):
+    # 'gzip, br;q=0.5, *;q=0' -> {'gzip': 1.0, 'br': 0.5, '*': 0.0}
+    accepted = {}
+    for part in value.split(','):
+        name, _, params = part.partition(';')
+        params = params.strip()
+        try:
+            quality = float(params[2:]) if params.startswith('q=') else 1.0
+        except ValueError:
+            continue
+        accepted[name.strip().lower()] = quality
+    return accepted
+
+
+def _encoding(event):
+    # Preferred encoding among the ones accepted by the client
+    accepted = _accepted(header(event, 'Accept-Encoding') or '')
+    if brotli is not None and accepted.get('br', 0) > 0:
+        return 'br'
+    if accepted.get('gzip', 0) > 0:
+        return 'gzip'
+    return None
+
+
+def _compress(event, response):
+    encoding = _encoding(event)
+    raw = response['body'].encode('utf-8')
+    if encoding is None or len(raw) < MIN_COMPRESS_SIZE:
+        return response
+    if encoding == 'br':
+        data = brotli.compress(raw, quality=BROTLI_QUALITY)
+    else:
+        data = gzip.compress(raw, compresslevel=GZIP_LEVEL)
+    response['headers']['Content-Encoding'] = encoding
+    response['body'] = base64.b64encode(data).decode('ascii')
+    response['isBase64Encoded'] = True
+    return response
+
+
+def respond(event, result, items, variant='', tag=None):
+    # 200 with ETag and, if accepted, a compressed body; or 304 when the
+    # client already has this version
+    tag = tag or etag(items, variant)
+    if tag and _not_modified(event, tag):
+        return {"statusCode": 304, "headers": {"ETag": tag}, "body": ""}
+    body = serializer.dumps(result)
+    if tag is None:
+        tag = _body_etag(body)
+        if _not_modified(event, tag):
+            return {"statusCode": 304, "headers": {"ETag": tag}, "body": ""}
+    response = {
+        "statusCode": 200,
+        "headers": {"ETag": tag, "Vary": "Accept-Encoding"},
+        "body": body
+    }
+    return _compress(event, response)
@@ -0,0 +1,202 @@
+import os
+import time
+import threading
+import functools
+import metrics
+
+DEFAULT_REGION = 'us-east-1'
+
+# Every client shares one botocore configuration: adaptive retries (with
+# client side rate limiting, so a throttled 1 RCU/1 WCU table is not
+# hammered), short timeouts and kept alive, pooled connections.
+MAX_ATTEMPTS = int(os.environ.get('AWS_MAX_ATTEMPTS', '5'))
+POOL_SIZE = int(os.environ.get('AWS_POOL_SIZE', '16'))
+CONNECT_TIMEOUT = float(os.environ.get('AWS_CONNECT_TIMEOUT', '1'))
+READ_TIMEOUT = float(os.environ.get('AWS_READ_TIMEOUT', '5'))
+
+# Read timeouts follow the time left in the invocation, rounded down to
+# steps of TIMEOUT_STEP seconds so only a few client variants are cached
+MIN_TIMEOUT = 0.5
+TIMEOUT_STEP = 0.5
+SAFETY_MARGIN = 0.2
+
+THROTTLE_CODES = ('ProvisionedThroughputExceededException',
+                  'ThrottlingException', 'RequestLimitExceeded',
+                  'TooManyRequestsException', 'Throttling')
+
+# Warm containers reuse these objects between invocations. Building a boto3
+# resource resolves credentials and endpoints, which costs more than the
+# DynamoDB call itself, so everything is created once and cached by key.
+_lock = threading.RLock()
+_sessions = {}
+_resources = {}
+_clients = {}
+_tables = {}
+
+# Milliseconds spent building each cached object, for cold start profiling
+build_times = {}
+
+# Throttled calls per 'service:operation', for this container and for the
+# invocation in progress (flushed as metrics when it ends)
+throttles = {}
+_pending_throttles = {}
+_invocation = {'timeout': READ_TIMEOUT, 'deadline': None}
+
+
+def _boto3():
+    # boto3 is by far the most expensive import of the handlers, so it is
+    # only loaded when the first session is built
+    import boto3
+    return boto3
+
+
+def _cached(cache, key, factory, kind):
+    value = cache.get(key)
+    if value is None:
+        with _lock:
+            value = cache.get(key)
+            if value is None:
+                start = time.perf_counter()
+                value = factory()
+                name = kind + ':' + '/'.join(str(k) for k in key if k)
+                build_times[name] = round(
+                    (time.perf_counter() - start) * 1000, 2)
+                cache[key] = value
+    return value
+
+
+def _timeout(remaining_ms):
+    seconds = remaining_ms / 1000.0 - SAFETY_MARGIN
+    seconds = seconds - seconds % TIMEOUT_STEP
+    return max(MIN_TIMEOUT, min(READ_TIMEOUT, seconds))
+
+
+def config(read_timeout=None):
+    from botocore.config import Config
+    read_timeout = read_timeout or READ_TIMEOUT
+    kwargs = {
+        'retries': {'mode': 'adaptive', 'max_attempts': MAX_ATTEMPTS},
+        'connect_timeout': min(CONNECT_TIMEOUT, read_timeout),
+        'read_timeout': read_timeout,
+        'max_pool_connections': POOL_SIZE,
+        'tcp_keepalive': True,
+    }
+    try:
+        return Config(**kwargs)
+    except TypeError:
+        # botocore older than 1.27 (the one of the Lambda runtime) has no
+        # tcp_keepalive option
+        del kwargs['tcp_keepalive']
+        return Config(**kwargs)
+
+
+def _count_throttle(response, operation, **kwargs):
+    # needs-retry handler: runs after every attempt, changes nothing
+    if not response or not isinstance(response[1], dict):
+        return None
+    code = response[1].get('Error', {}).get('Code')
+    if code in THROTTLE_CODES:
+        name = operation.service_model.service_name + ':' + operation.name
+        with _lock:
+            throttles[name] = throttles.get(name, 0) + 1
+            _pending_throttles[name] = _pending_throttles.get(name, 0) + 1
+    return None
+
+
+def _instrument(client):
+    client.meta.events.register('needs-retry', _count_throttle)
+    return client
+
+
+def flush_throttles():
+    # Emits and resets the throttles counted since the last flush
+    with _lock:
+        pending = dict(_pending_throttles)
+        _pending_throttles.clear()
+    if metrics.enabled():
+        for name, count in sorted(pending.items()):
+            service, operation = name.split(':', 1)
+            metrics.emit({'Service': service, 'Operation': operation},
+                         {'Throttles': count}, {'Throttles': 'Count'})
+    return pending
+
+
+def deadline(handler):
+    # Clients used by the handler time out before the Lambda does
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        remaining = getattr(context, 'get_remaining_time_in_millis', None)
+        _invocation['timeout'] = (_timeout(remaining()) if remaining
+                                  else READ_TIMEOUT)
+        _invocation['deadline'] = (
+            time.monotonic() + remaining() / 1000.0 - SAFETY_MARGIN
+            if remaining else None)
+        try:
+            return handler(event, context)
+        finally:
+            _invocation['deadline'] = None
+            flush_throttles()
+    return wrapper
+
+
+def time_left():
+    # Seconds the handler can still spend on retries, None outside of a
+    # Lambda invocation
+    if _invocation['deadline'] is None:
+        return None
+    return _invocation['deadline'] - time.monotonic()
+
+
+def get_session(region=DEFAULT_REGION):
+    return _cached(_sessions, (region,),
+                   lambda: _boto3().session.Session(region_name=region),
+                   'session')
+
+
+def _build_resource(service, region, endpoint, timeout):
+    resource = get_session(region).resource(
+        service, endpoint_url=endpoint, config=config(timeout))
+    _instrument(resource.meta.client)
+    return resource
+
+
+def get_resource(service, region=DEFAULT_REGION, endpoint=None):
+    endpoint = endpoint or None
+    timeout = _invocation['timeout']
+    return _cached(
+        _resources, (service, region, endpoint, timeout),
+        lambda: _build_resource(service, region, endpoint, timeout),
+        'resource')
+
+
+def get_client(service, region=DEFAULT_REGION, endpoint=None):
+    endpoint = endpoint or None
+    timeout = _invocation['timeout']
+    return _cached(
+        _clients, (service, region, endpoint, timeout),
+        lambda: _instrument(get_session(region).client(
+            service, endpoint_url=endpoint, config=config(timeout))),
+        'client')
+
+
+def get_table(name, region=DEFAULT_REGION, endpoint=None):
+    endpoint = endpoint or None
+    timeout = _invocation['timeout']
+    return _cached(
+        _tables, (region, endpoint, name, timeout),
+        lambda: get_resource('dynamodb', region, endpoint).Table(name),
+        'table')
+
+
+def reset():
+    # For unit testing: drop every cached session, resource and client
+    with _lock:
+        _tables.clear()
+        _clients.clear()
+        _resources.clear()
+        _sessions.clear()
+        build_times.clear()
+        throttles.clear()
+        _pending_throttles.clear()
+        _invocation['timeout'] = READ_TIMEOUT
+        _invocation['deadline'] = None
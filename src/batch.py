@@ -0,0 +1,54 @@
+import coldstart
+import awsclients
+import apigateway
+import json
+import jsonlogger
+import todoList
+
+logger = jsonlogger.get_logger()
+
+MAX_ITEMS = 500
+
+
+def _response(status, body):
+    return {
+        "statusCode": status,
+        "body": json.dumps(body)
+    }
+
+
+def _validate(values, name):
+    if not isinstance(values, list) or not 0 < len(values) <= MAX_ITEMS:
+        logger.error("Validation failed")
+        raise ValueError('%s must be a list of 1 to %d elements'
+                         % (name, MAX_ITEMS))
+
+
+@coldstart.profile
+@jsonlogger.correlated
+@awsclients.deadline
+def create(event, context):
+    data = apigateway.request_json(event)
+    try:
+        _validate(data.get('items'), 'items')
+        if not all(isinstance(item, dict) and 'text' in item
+                   for item in data['items']):
+            raise ValueError('every item needs a text')
+    except ValueError as e:
+        return _response(400, {"message": str(e)})
+    results = todoList.put_items([item['text'] for item in data['items']],
+                                 owner=data.get('owner'))
+    return _response(200, {"results": results})
+
+
+@coldstart.profile
+@jsonlogger.correlated
+@awsclients.deadline
+def delete(event, context):
+    data = apigateway.request_json(event)
+    try:
+        _validate(data.get('ids'), 'ids')
+    except ValueError as e:
+        return _response(400, {"message": str(e)})
+    results = todoList.delete_items(data['ids'])
+    return _response(200, {"results": results})
@@ -0,0 +1,176 @@
+import os
+import re
+import time
+import awsclients
+import dynamobatch
+import jsonlogger
+
+# Compact change records written from the stream of the todos table. They
+# are partitioned by UTC day and sorted by position (creation millisecond
+# plus stream sequence number), so a poll only reads the days it covers.
+RETENTION_DAYS = int(os.environ.get('CHANGES_RETENTION_DAYS', '7'))
+DAY_MS = 24 * 3600 * 1000
+
+# Positions come from the 1 second ApproximateCreationDateTime and per
+# shard sequence numbers, and shards are consumed concurrently, so a
+# change can be recorded behind positions already served. Only positions
+# older than the watermark are served; it must stay above the maximum
+# iterator age of the stream consumer (alarmed on in the templates).
+WATERMARK_MS = int(os.environ.get('CHANGES_WATERMARK_SECONDS', '60')) * 1000
+
+# Stream event names and the operation stored in the change record
+OPERATIONS = {'INSERT': 'create', 'MODIFY': 'update', 'REMOVE': 'delete'}
+
+_CURSOR = re.compile(r'^\d{13}(:\d{40})?$')
+
+logger = jsonlogger.get_logger()
+
+
+class ResyncRequired(Exception):
+    # The requested changes are older than the retention of the table
+    pass
+
+
+def get_table(dynamodb=None):
+    name = os.environ['CHANGES_TABLE']
+    if dynamodb:
+        return dynamodb.Table(name)
+    return awsclients.get_table(
+        name, endpoint=os.environ.get('ENDPOINT_OVERRIDE'))
+
+
+def _day(ms):
+    return time.strftime('%Y-%m-%d', time.gmtime(ms // 1000))
+
+
+def _version(image):
+    # Items created before versioning only have updatedAt
+    value = (image.get('version') or image.get('updatedAt') or {}).get('N')
+    return int(value) if value is not None else None
+
+
+def change(record):
+    # Change record for one DynamoDB stream record of the todos table
+    stream = record['dynamodb']
+    ms = int(float(stream['ApproximateCreationDateTime']) * 1000)
+    position = '%013d:%s' % (ms, stream['SequenceNumber'].zfill(40))
+    return {
+        'day': _day(ms),
+        'position': position,
+        'id': stream['Keys']['id']['S'],
+        'op': OPERATIONS[record['eventName']],
+        'version': _version(stream.get('NewImage', {})),
+        'timestamp': ms,
+        'expiresAt': ms // 1000 + RETENTION_DAYS * 24 * 3600,
+    }
+
+
+def _changes(records):
+    # A record that can not be read would block the shard on every retry,
+    # it is logged and skipped
+    changes = []
+    for item in records:
+        try:
+            changes.append(change(item))
+        except (KeyError, TypeError, ValueError):
+            logger.exception('skipping stream record %s',
+                             item.get('eventID'))
+    return changes
+
+
+def record(records, dynamodb=None):
+    # Positions are deterministic, so a retried stream batch overwrites
+    # the same records instead of duplicating them
+    table = get_table(dynamodb)
+    changes = _changes(records)
+    failed = dynamobatch.write(
+        table.meta.client, table.name,
+        [{'PutRequest': {'Item': item}} for item in changes])
+    if failed:
+        logger.error('recording changes failed: %d unprocessed',
+                     len(failed))
+        raise RuntimeError('%d changes could not be recorded' % len(failed))
+    return len(changes)
+
+
+def _start(since, cursor):
+    if cursor is not None:
+        if not _CURSOR.match(cursor):
+            raise ValueError('invalid cursor')
+        return cursor
+    try:
+        return '%013d' % int(since)
+    except (TypeError, ValueError):
+        raise ValueError('since must be a timestamp in milliseconds')
+
+
+def _read_day(table, day, start, end, limit):
+    # Positions after start and before end, in order
+    kwargs = {
+        'KeyConditionExpression': '#day = :day AND #position > :start',
+        'ExpressionAttributeNames': {'#day': 'day', '#position': 'position'},
+        'ExpressionAttributeValues': {':day': day, ':start': start},
+    }
+    items = []
+    while limit is None or len(items) < limit:
+        if limit:
+            kwargs['Limit'] = limit - len(items)
+        result = table.query(**kwargs)
+        served = [i for i in result['Items'] if i['position'] < end]
+        items.extend(served)
+        if len(served) < len(result['Items']) or (
+                'LastEvaluatedKey' not in result):
+            break
+        kwargs['ExclusiveStartKey'] = result['LastEvaluatedKey']
+    return items
+
+
+def changes_since(since=None, cursor=None, limit=None, dynamodb=None):
+    # Changes after the since timestamp or after the cursor returned by a
+    # previous call, oldest first, up to the watermark. Returns (changes,
+    # cursor).
+    start = _start(since, cursor)
+    first = int(start[:13])
+    now = int(time.time() * 1000)
+    if first < now - RETENTION_DAYS * DAY_MS:
+        raise ResyncRequired('changes before %d are no longer available'
+                             % (now - RETENTION_DAYS * DAY_MS))
+    last = now - WATERMARK_MS
+    end = '%013d' % last
+    table = get_table(dynamodb)
+    items = []
+    for ms in range(first - first % DAY_MS, last + 1, DAY_MS):
+        remaining = limit - len(items) if limit else None
+        items.extend(_read_day(table, _day(ms), start, end, remaining))
+        if limit and len(items) >= limit:
+            break
+    changes = [{field: item[field]
+                for field in ('id', 'op', 'version', 'timestamp')}
+               for item in items]
+    if limit and len(items) >= limit:
+        return changes, items[-1]['position']
+    # Everything before the watermark was read, so the cursor moves up to
+    # it even when idle and does not fall out of the retention window
+    return changes, max(start, end)
+
+
+def create_changes_table(dynamodb):
+    # For unit testing
+    tableName = os.environ['CHANGES_TABLE']
+    table = dynamodb.create_table(
+        TableName=tableName,
+        KeySchema=[
+            {'AttributeName': 'day', 'KeyType': 'HASH'},
+            {'AttributeName': 'position', 'KeyType': 'RANGE'},
+        ],
+        AttributeDefinitions=[
+            {'AttributeName': 'day', 'AttributeType': 'S'},
+            {'AttributeName': 'position', 'AttributeType': 'S'},
+        ],
+        ProvisionedThroughput={
+            'ReadCapacityUnits': 1,
+            'WriteCapacityUnits': 1
+        }
+    )
+    table.meta.client.get_waiter('table_exists').wait(TableName=tableName)
+    return table
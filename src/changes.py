@@ -0,0 +1,54 @@
+import coldstart
+import awsclients
+import jsonlogger
+import json
+import serializer
+import changefeed
+
+MAX_LIMIT = 1000
+
+
+def _changes_args(params):
+    if 'since' not in params and 'cursor' not in params:
+        raise ValueError('since or cursor is required')
+    limit = params.get('limit')
+    if limit is not None:
+        limit = int(limit)
+        if not 0 < limit <= MAX_LIMIT:
+            raise ValueError('limit must be between 1 and %d' % MAX_LIMIT)
+    return params.get('since'), params.get('cursor'), limit
+
+
+@coldstart.profile
+@jsonlogger.correlated
+@awsclients.deadline
+def changes(event, context):
+    params = event.get('queryStringParameters') or {}
+    try:
+        # fetch the changes after since (or the cursor of the last poll)
+        changes, cursor = changefeed.changes_since(*_changes_args(params))
+    except ValueError as e:
+        return {
+            "statusCode": 400,
+            "body": json.dumps({"message": str(e)})
+        }
+    except changefeed.ResyncRequired as e:
+        # the client has to download the full list again
+        return {
+            "statusCode": 410,
+            "body": json.dumps({"message": str(e)})
+        }
+    # create a response
+    response = {
+        "statusCode": 200,
+        "body": serializer.dumps({"changes": changes, "cursor": cursor})
+    }
+    return response
+
+
+@coldstart.profile
+@jsonlogger.correlated
+@awsclients.deadline
+def consume(event, context):
+    # DynamoDB stream of the todos table, an exception retries the batch
+    return {"recorded": changefeed.record(event['Records'])}
@@ -0,0 +1,55 @@
+import os
+import json
+import time
+import functools
+import awsclients
+
+# Handlers import this module first, so the time between this line and the
+# decoration of the handler is the cost of the rest of their imports.
+_imported_at = time.perf_counter()
+
+# Modules imported on demand (router) start counting when their import
+# begins, not when this module was loaded
+_import_started = {}
+
+
+def enabled():
+    return os.environ.get('COLDSTART_PROFILE', '').lower() in ('1', 'true')
+
+
+def mark_import(module):
+    # Called right before importing a handler module lazily
+    _import_started.setdefault(module, time.perf_counter())
+
+
+def _emit(name, import_ms, first_call_ms):
+    # One structured log line per container and handler
+    print(json.dumps({
+        'coldstart': True,
+        'handler': name,
+        'import_ms': round(import_ms, 2),
+        'first_call_ms': round(first_call_ms, 2),
+        'client_build_ms': dict(awsclients.build_times),
+    }))
+
+
+def profile(handler):
+    # Opt-in with COLDSTART_PROFILE=true, otherwise the handler is untouched
+    if not enabled():
+        return handler
+    started = _import_started.get(handler.__module__, _imported_at)
+    import_ms = (time.perf_counter() - started) * 1000
+    name = handler.__module__ + '.' + handler.__name__
+    state = {'cold': True}
+
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        if not state['cold']:
+            return handler(event, context)
+        state['cold'] = False
+        start = time.perf_counter()
+        try:
+            return handler(event, context)
+        finally:
+            _emit(name, import_ms, (time.perf_counter() - start) * 1000)
+    return wrapper
@@ -1,17 +1,53 @@
+import coldstart
+import awsclients
+import apigateway
 import json
-import logging
+import jsonlogger
+import serializer
 import todoList
+import writequeue
 
+logger = jsonlogger.get_logger()
 
+
+@coldstart.profile
+@jsonlogger.correlated
+@awsclients.deadline
 def create(event, context):
-    data = json.loads(event['body'])
+    data = apigateway.request_json(event)
     if 'text' not in data:
-        logging.error("Validation failed")
+        logger.error("Validation failed")
         raise Exception("Couldn't create the todo item.")
-    item = todoList.put_item(data['text'])
+    if writequeue.enabled():
+        # write-behind: the item is stored when the queue is flushed
+        item = todoList.enqueue_item(data['text'], owner=data.get('owner'))
+        return {
+            "statusCode": 202,
+            "body": serializer.dumps(item)
+        }
+    item = todoList.put_item(data['text'], owner=data.get('owner'))
     # create a response
     response = {
         "statusCode": 200,
         "body": json.dumps(item)
     }
     return response
+
+
+@coldstart.profile
+@jsonlogger.correlated
+@awsclients.deadline
+def flush(event, context):
+    # SQS event of the create queue, or the local queue when there is none
+    local = 'Records' not in event
+    records = writequeue.receive() if local else event['Records']
+    failed = todoList.flush_queued(records) if records else []
+    if failed:
+        logger.error('flush failed for %d of %d items',
+                     len(failed), len(records))
+        if local:
+            writequeue.requeue([r for r in records
+                                if r['messageId'] in failed])
+    # Only the failed messages go back to the queue (ReportBatchItemFailures)
+    return {"batchItemFailures": [{"itemIdentifier": message_id}
+                                  for message_id in failed]}
@@ -1,6 +1,12 @@
+import coldstart
+import awsclients
+import jsonlogger
 import todoList
 
 
+@coldstart.profile
+@jsonlogger.correlated
+@awsclients.deadline
 def delete(event, context):
     todoList.delete_item(event['pathParameters']['id'])
 
@@ -0,0 +1,103 @@
+import time
+import random
+import awsclients
+import jsonlogger
+from botocore.exceptions import ClientError
+
+# DynamoDB limits per BatchWriteItem and BatchGetItem request
+MAX_WRITE_BATCH = 25
+MAX_GET_BATCH = 100
+MAX_ATTEMPTS = 8
+BASE_DELAY = 0.05
+MAX_DELAY = 2.0
+
+_random = random.SystemRandom()
+logger = jsonlogger.get_logger()
+
+
+class IncompleteRead(Exception):
+    # Some keys could not be read, after the retries or before the deadline
+    pass
+
+
+def chunks(seq, size):
+    for start in range(0, len(seq), size):
+        yield seq[start:start + size]
+
+
+def backoff_delay(attempt):
+    # Exponential backoff with full jitter
+    return _random.uniform(0, min(MAX_DELAY, BASE_DELAY * 2 ** attempt))
+
+
+def _out_of_time(delay=0):
+    # Retrying past the invocation deadline would time the Lambda out
+    left = awsclients.time_left()
+    return left is not None and left <= delay
+
+
+def _wait(attempt, sleep):
+    # False when the next attempt would not fit in the invocation
+    delay = backoff_delay(attempt)
+    if _out_of_time(delay):
+        logger.warning('Deadline reached after %d attempts', attempt)
+        return False
+    sleep(delay)
+    return True
+
+
+def _write_chunk(client, table_name, chunk, sleep):
+    pending = {table_name: chunk}
+    for attempt in range(MAX_ATTEMPTS):
+        if attempt and not _wait(attempt, sleep):
+            break
+        try:
+            result = client.batch_write_item(RequestItems=pending)
+        except ClientError as e:
+            logger.error('batchWriteItem failed: %s',
+                         e.response['Error']['Message'])
+            break
+        pending = result.get('UnprocessedItems') or {}
+        if not pending:
+            return []
+    return pending.get(table_name, [])
+
+
+def write(client, table_name, requests, sleep=time.sleep):
+    # Writes the requests in chunks of 25, retrying UnprocessedItems.
+    # Returns the requests that could not be written, including the ones
+    # left when the invocation runs out of time.
+    failed = []
+    for chunk in chunks(requests, MAX_WRITE_BATCH):
+        if _out_of_time():
+            failed.extend(chunk)
+            continue
+        failed.extend(_write_chunk(client, table_name, chunk, sleep))
+    return failed
+
+
+def _get_chunk(client, table_name, keys, sleep, projection):
+    items = []
+    # UnprocessedKeys keep the projection of the request
+    pending = {table_name: dict(projection or {}, Keys=keys)}
+    for attempt in range(MAX_ATTEMPTS):
+        if attempt and not _wait(attempt, sleep):
+            break
+        result = client.batch_get_item(RequestItems=pending)
+        items.extend(result['Responses'].get(table_name, []))
+        pending = result.get('UnprocessedKeys') or {}
+        if not pending:
+            return items
+    raise IncompleteRead('Unprocessed keys after %d attempts' % attempt)
+
+
+def get(client, table_name, keys, sleep=time.sleep, projection=None):
+    # Reads the keys in chunks of 100, retrying UnprocessedKeys.
+    # Items come back in no particular order.
+    items = []
+    for chunk in chunks(keys, MAX_GET_BATCH):
+        if _out_of_time():
+            raise IncompleteRead('Deadline reached with unread keys')
+        items.extend(_get_chunk(client, table_name, chunk, sleep,
+                                projection))
+    return items
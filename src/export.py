@@ -0,0 +1,70 @@
+import coldstart
+import awsclients
+import jsonlogger
+import os
+import json
+import serializer
+import todoList
+
+MAX_SEGMENTS = 64
+
+# Items per response. Each segment reads its share, so a page stays far
+# from the 6 MB Lambda response limit; the cursor resumes the export.
+PAGE_SIZE = 1000
+
+
+def _segments(value):
+    # By default one segment per core, the read capacity sets the real limit
+    segments = int(value or os.cpu_count() or 1)
+    if not 0 < segments <= MAX_SEGMENTS:
+        raise ValueError('segments must be between 1 and %d' % MAX_SEGMENTS)
+    return segments
+
+
+def _resume(cursor):
+    # {"segments": n, "pending": [[segment, start key or null], ...]}
+    state = todoList.decode_state(cursor)
+    try:
+        segments = _segments(state['segments'])
+        pending = [(int(segment), key) for segment, key in state['pending']]
+    except (TypeError, KeyError):
+        raise ValueError('Invalid cursor: ' + cursor)
+    if not pending or not all(
+            0 <= segment < segments and
+            (key is None or todoList.is_scan_key(key))
+            for segment, key in pending):
+        raise ValueError('Invalid cursor: ' + cursor)
+    return segments, pending
+
+
+def _export_args(params):
+    fields = todoList.parse_fields(params.get('fields'))
+    if params.get('cursor'):
+        return _resume(params['cursor']) + (fields,)
+    segments = _segments(params.get('segments'))
+    return segments, [(segment, None) for segment in range(segments)], fields
+
+
+@coldstart.profile
+@jsonlogger.correlated
+@awsclients.deadline
+def export(event, context):
+    params = event.get('queryStringParameters') or {}
+    try:
+        segments, pending, fields = _export_args(params)
+    except ValueError as e:
+        return {
+            "statusCode": 400,
+            "body": json.dumps({"message": str(e)})
+        }
+    # fetch the next page of every segment with a parallel scan
+    items, left = todoList.scan_segments(
+        pending, segments, max(1, PAGE_SIZE // len(pending)), fields)
+    cursor = todoList.encode_cursor(
+        {'segments': segments, 'pending': left} if left else None)
+    # create a response
+    response = {
+        "statusCode": 200,
+        "body": serializer.dumps({"items": items, "cursor": cursor})
+    }
+    return response
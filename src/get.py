@@ -1,17 +1,30 @@
+import coldstart
+import awsclients
+import apigateway
+import jsonlogger
 import json
-import decimalencoder
 import todoList
 
 
+@coldstart.profile
+@jsonlogger.correlated
+@awsclients.deadline
 def get(event, context):
+    params = event.get('queryStringParameters') or {}
+    try:
+        fields = todoList.parse_fields(params.get('fields'))
+    except ValueError as e:
+        return {
+            "statusCode": 400,
+            "body": json.dumps({"message": str(e)})
+        }
     # create a response
-    item = todoList.get_item(event['pathParameters']['id'])
+    item = todoList.get_item(event['pathParameters']['id'], fields=fields)
     if item:
-        response = {
-            "statusCode": 200,
-            "body": json.dumps(item,
-                               cls=decimalencoder.DecimalEncoder)
-        }
+        # 304 if the client already has this version
+        tag = None if fields else apigateway.item_etag(item)
+        response = apigateway.respond(event, item, [item],
+                                      params.get('fields') or '', tag)
     else:
         response = {
             "statusCode": 404,
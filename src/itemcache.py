@@ -0,0 +1,91 @@
+import os
+import time
+import threading
+import lrucache
+
+# Optional read-through cache of todo items, disabled unless ITEM_CACHE_TTL
+# (seconds) is set. Every warm container keeps its own LRU, and a shared
+# backend can sit behind it so containers also reuse each other's reads.
+# Writes through todoList invalidate both levels; the TTL bounds how long
+# other containers may serve an item changed elsewhere.
+TTL = float(os.environ.get('ITEM_CACHE_TTL') or 0)
+SIZE = int(os.environ.get('ITEM_CACHE_SIZE', '1024'))
+
+_memory = lrucache.LRUCache(SIZE, ttl=TTL or None)
+_state = {'backend': None, 'backend_hits': 0}
+
+
+class LocalBackend(object):
+    # In process stand-in for a shared cache (Redis, Memcached...). Any
+    # object with the same get, set and delete methods can be plugged in.
+
+    def __init__(self, clock=time.time):
+        self._clock = clock
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry and self._clock() < entry[0]:
+                return entry[1]
+            self._data.pop(key, None)
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (self._clock() + ttl, value)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+def enabled():
+    return _memory.ttl is not None
+
+
+def configure(ttl=None, backend=None):
+    # Changes the TTL (None disables the cache) and the shared backend,
+    # dropping whatever was cached
+    _memory.ttl = ttl or None
+    _state['backend'] = backend
+    clear()
+
+
+def get(key):
+    if not enabled():
+        return None
+    item = _memory.get(key)
+    if item is None and _state['backend'] is not None:
+        item = _state['backend'].get(key)
+        if item is not None:
+            _state['backend_hits'] += 1
+            _memory.set(key, item)
+    # Callers get their own copy, so they can not alter the cached one
+    return dict(item) if item is not None else None
+
+
+def put(key, item):
+    if not enabled():
+        return
+    _memory.set(key, dict(item))
+    if _state['backend'] is not None:
+        _state['backend'].set(key, dict(item), _memory.ttl)
+
+
+def invalidate(key):
+    _memory.delete(key)
+    if _state['backend'] is not None:
+        _state['backend'].delete(key)
+
+
+def clear():
+    _memory.clear()
+    _state['backend_hits'] = 0
+
+
+def stats():
+    # Misses count the reads that had to go past the in-memory LRU
+    result = _memory.stats()
+    result['backendHits'] = _state['backend_hits']
+    return result
@@ -0,0 +1,78 @@
+import os
+import sys
+import json
+import random
+import logging
+import functools
+
+LOGGER_NAME = 'todo'
+
+# Fraction of the high volume events (one per read, for instance) that
+# are actually written. Errors are never sampled.
+SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', '0.01'))
+
+_random = random.SystemRandom()
+
+# A Lambda container serves one invocation at a time, so the request id is
+# shared by every thread working on it
+_request = {'id': None}
+
+
+class JsonFormatter(logging.Formatter):
+    # One JSON object per line, so CloudWatch Logs Insights can query fields
+
+    def format(self, record):
+        entry = {
+            'timestamp': int(record.created * 1000),
+            'level': record.levelname,
+            'message': record.getMessage(),
+            'requestId': _request['id'],
+        }
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    # Records logged with extra=sampled() only pass for a fraction of calls
+
+    def filter(self, record):
+        rate = getattr(record, 'sample_rate', None)
+        return rate is None or _random.random() < rate
+
+
+def sampled(rate=None, **fields):
+    # extra= argument for high volume events
+    return {'sample_rate': SAMPLE_RATE if rate is None else rate,
+            'fields': fields}
+
+
+def with_fields(**fields):
+    # extra= argument to add structured fields to a single record
+    return {'fields': fields}
+
+
+def get_logger():
+    logger = logging.getLogger(LOGGER_NAME)
+    if not logger.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(JsonFormatter())
+        handler.addFilter(SamplingFilter())
+        logger.addHandler(handler)
+        logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO').upper())
+        logger.propagate = False
+    return logger
+
+
+def bind(context):
+    # Correlates the following log lines with the Lambda request id
+    _request['id'] = getattr(context, 'aws_request_id', None)
+
+
+def correlated(handler):
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        bind(context)
+        return handler(event, context)
+    return wrapper
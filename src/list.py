@@ -1,14 +1,126 @@
+import coldstart
+import awsclients
+import apigateway
+import jsonlogger
 import json
-import decimalencoder
 import todoList
+import dynamobatch
+from botocore.exceptions import ClientError
 
+logger = jsonlogger.get_logger()
 
-def list(event, context):
+MAX_LIMIT = 1000
+# A single BatchGetItem, so its retries fit in the 3 second timeout
+MAX_IDS = 100
+
+
+class IndexUnavailable(Exception):
+    # The index is not created yet, they are added one per deploy
+    # (TodosIndexes)
+    pass
+
+
+def _page_args(params):
+    limit = params.get('limit')
+    if limit is not None:
+        limit = int(limit)
+        if not 0 < limit <= MAX_LIMIT:
+            raise ValueError('limit must be between 1 and %d' % MAX_LIMIT)
+    return limit, params.get('cursor')
+
+
+def _get_page(params, fields):
+    # fetch a single page, the cursor points to the next one
+    limit, cursor = _page_args(params)
+    items, cursor = todoList.get_page(limit, cursor, fields=fields)
+    return {"items": items, "cursor": cursor}
+
+
+def _get_by_ids(params, fields):
+    # fetch the requested todos with batched reads
+    ids = [key for key in params['ids'].split(',') if key]
+    if not 0 < len(ids) <= MAX_IDS:
+        raise ValueError('ids must contain 1 to %d ids' % MAX_IDS)
+    return todoList.get_items_by_ids(ids, fields=fields)
+
+
+def _query(params, fields):
+    # fetch the todos of an owner and/or checked state through an index
+    checked = params.get('checked')
+    if checked is not None:
+        if checked not in ('true', 'false'):
+            raise ValueError('checked must be true or false')
+        checked = checked == 'true'
+    return todoList.query_items(params.get('owner'), checked,
+                                params.get('since'), fields=fields)
+
+
+def _recent(params, fields):
+    # newest todos first, or those created since a timestamp oldest first
+    order = 'oldest' if 'since' in params else 'newest'
+    if params.get('order', order) != order:
+        raise ValueError('order must be ' + order)
+    limit, _ = _page_args(params)
+    return todoList.recent_items(params.get('since'), limit,
+                                 fields=fields)
+
+
+def _indexed(read, params, fields):
+    # DynamoDB answers a query on a missing index with a ValidationException
+    # (ResourceNotFoundException in local emulators)
+    try:
+        return read(params, fields)
+    except ClientError as e:
+        error = e.response['Error']
+        if error['Code'] not in ('ValidationException',
+                                 'ResourceNotFoundException') or (
+                'index' not in error['Message'].lower()):
+            raise
+        raise IndexUnavailable(error['Message'])
+
+
+def _fetch(params):
+    # only the requested attributes are read and returned
+    fields = todoList.parse_fields(params.get('fields'))
+    if 'ids' in params:
+        return _get_by_ids(params, fields)
+    if set(params) & {'owner', 'checked'}:
+        return _indexed(_query, params, fields)
+    if set(params) & {'since', 'order'}:
+        return _indexed(_recent, params, fields)
+    if 'limit' in params or 'cursor' in params:
+        return _get_page(params, fields)
     # fetch all todos from the database
-    result = todoList.get_items()
-    # create a response
-    response = {
-        "statusCode": 200,
-        "body": json.dumps(result, cls=decimalencoder.DecimalEncoder)
-    }
-    return response
+    return todoList.get_items(fields=fields)
+
+
+@coldstart.profile
+@jsonlogger.correlated
+@awsclients.deadline
+def list(event, context):
+    params = event.get('queryStringParameters') or {}
+    try:
+        result = _fetch(params)
+    except ValueError as e:
+        return {
+            "statusCode": 400,
+            "body": json.dumps({"message": str(e)})
+        }
+    except dynamobatch.IncompleteRead as e:
+        logger.error('batch read failed: %s', e)
+        return {
+            "statusCode": 503,
+            "body": json.dumps({"message": "Couldn't read every todo, "
+                                           "try again"})
+        }
+    except IndexUnavailable as e:
+        logger.error('index not available: %s', e)
+        return {
+            "statusCode": 503,
+            "body": json.dumps({"message": "This listing needs an index "
+                                           "that is not available yet"})
+        }
+    # create a response, 304 if the client already has this version
+    items = result['items'] if isinstance(result, dict) else result
+    variant = '&'.join('%s=%s' % param for param in sorted(params.items()))
+    return apigateway.respond(event, result, items, variant)
@@ -0,0 +1,61 @@
+import time
+import threading
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    # Small thread safe least recently used cache for warm containers.
+    # With ttl (seconds) entries also expire, and they are dropped when
+    # they are read after that.
+
+    def __init__(self, maxsize=128, ttl=None, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _expired(self, expires):
+        return expires is not None and self._clock() >= expires
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data and self._expired(self._data[key][0]):
+                del self._data[key]
+                self.expirations += 1
+            if key not in self._data:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._data.move_to_end(key)
+            return self._data[key][1]
+
+    def set(self, key, value):
+        expires = self._clock() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def stats(self):
+        return {'size': len(self._data), 'hits': self.hits,
+                'misses': self.misses, 'evictions': self.evictions,
+                'expirations': self.expirations}
+
+    def __len__(self):
+        return len(self._data)
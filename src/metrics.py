@@ -0,0 +1,79 @@
+import os
+import json
+import time
+
+# Metrics are written as CloudWatch Embedded Metric Format log lines, so
+# they cost no extra API calls. Both switches are opt-in.
+NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'TodoList')
+
+# Operations that consume write capacity, the rest consume read capacity
+WRITE_OPERATIONS = ('PutItem', 'UpdateItem', 'DeleteItem', 'BatchWriteItem')
+
+
+def enabled():
+    return os.environ.get('METRICS_ENABLED', '').lower() in ('1', 'true')
+
+
+def capacity_args():
+    # Extra arguments for DynamoDB calls that report consumed capacity
+    if enabled() and os.environ.get('RETURN_CONSUMED_CAPACITY',
+                                    '').lower() in ('1', 'true'):
+        return {'ReturnConsumedCapacity': 'TOTAL'}
+    return {}
+
+
+def _capacity_units(consumed):
+    # Single table calls return a dict, batch calls a list of them
+    if isinstance(consumed, dict):
+        consumed = [consumed]
+    return sum(float(c.get('CapacityUnits', 0)) for c in consumed or [])
+
+
+def emit(dimensions, values, units):
+    print(json.dumps({
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': NAMESPACE,
+                'Dimensions': [sorted(dimensions)],
+                'Metrics': [{'Name': name, 'Unit': units[name]}
+                            for name in sorted(values)],
+            }],
+        },
+        **dimensions,
+        **values,
+    }))
+
+
+class operation(object):
+    # Times a todoList operation and adds the capacity of its responses:
+    #
+    #     with metrics.operation('GetItem') as op:
+    #         op.record(table.get_item(..., **metrics.capacity_args()))
+
+    def __init__(self, name):
+        self.name = name
+        self.capacity = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def record(self, response):
+        if response and 'ConsumedCapacity' in response:
+            self.capacity = (self.capacity or 0) + _capacity_units(
+                response['ConsumedCapacity'])
+        return response
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if not enabled():
+            return False
+        values = {'Latency': (time.perf_counter() - self.start) * 1000}
+        units = {'Latency': 'Milliseconds'}
+        if self.capacity is not None:
+            name = ('ConsumedWCU' if self.name in WRITE_OPERATIONS
+                    else 'ConsumedRCU')
+            values[name] = self.capacity
+            units[name] = 'Count'
+        emit({'Operation': self.name}, values, units)
+        return False
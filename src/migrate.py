@@ -0,0 +1,16 @@
+import coldstart
+import awsclients
+import jsonlogger
+import migrations
+
+
+@coldstart.profile
+@jsonlogger.correlated
+@awsclients.deadline
+def migrate(event, context):
+    # Invoked by hand before creating the indexes, with the cursor of the
+    # previous call until it comes back null:
+    # {"cursor": "...", "owners": {"<id>": "<owner>"}}
+    event = event or {}
+    return migrations.backfill_items(event.get('cursor'),
+                                     event.get('owners'))
@@ -0,0 +1,92 @@
+import decimal
+import jsonlogger
+import awsclients
+import todoList
+from botocore.exceptions import ClientError
+
+# One-off backfill of the todos created before the global secondary
+# indexes. Items only show up in an index once they have its keys, so
+# every legacy item gets 'status' (from 'checked') and, when the caller
+# knows it, 'owner'. createdAt, the numeric sort key of the indexes, and
+# updatedAt were stored as strings of epoch seconds and become integer
+# milliseconds: an item with a string key can not be written once the
+# index exists. It must run before each index is created.
+PAGE_SIZE = 100
+
+# Seconds kept for the last page, the returned cursor resumes the backfill
+MIN_TIME_LEFT = 5
+
+logger = jsonlogger.get_logger()
+
+
+def _ms(value):
+    # '1610000000.123456' (seconds) -> 1610000000123
+    return int(decimal.Decimal(value) * 1000)
+
+
+def _changes(item, owners):
+    # New values of the attributes to migrate, with the condition that
+    # keeps each one from overwriting a concurrent update
+    changes = {}
+    if 'status' not in item:
+        changes['status'] = (todoList.item_status(item.get('checked')),
+                             'attribute_not_exists(#status)')
+    if 'owner' not in item and owners.get(item['id']):
+        changes['owner'] = (owners[item['id']],
+                            'attribute_not_exists(#owner)')
+    for name in ('createdAt', 'updatedAt'):
+        if isinstance(item.get(name), str):
+            changes[name] = (_ms(item[name]), '#%s = :old%s' % (name, name))
+    return changes
+
+
+def _update_args(item, changes):
+    values = {':%s' % name: value for name, (value, _) in changes.items()}
+    values.update({':old%s' % name: item[name] for name in changes
+                   if name in ('createdAt', 'updatedAt')})
+    return {
+        'Key': {'id': item['id']},
+        'ExpressionAttributeNames': {'#%s' % name: name for name in changes},
+        'ExpressionAttributeValues': values,
+        'UpdateExpression': 'SET ' + ', '.join(
+            '#%s = :%s' % (name, name) for name in changes),
+        'ConditionExpression': ' AND '.join(
+            ['attribute_exists(id)'] +
+            [condition for _, condition in changes.values()]),
+    }
+
+
+def backfill_item(table, item, owners=None):
+    # True if the item was updated. A failed condition means another
+    # writer got there first, the next run looks at the item again.
+    changes = _changes(item, owners or {})
+    if not changes:
+        return False
+    try:
+        table.update_item(**_update_args(item, changes))
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        return False
+    return True
+
+
+def _out_of_time():
+    left = awsclients.time_left()
+    return left is not None and left < MIN_TIME_LEFT
+
+
+def backfill_items(cursor=None, owners=None, dynamodb=None):
+    # Walks the table from cursor. Returns the counts and the cursor to
+    # resume from, None once every item has been visited.
+    table = todoList.get_table(dynamodb)
+    scanned = updated = 0
+    while True:
+        items, cursor = todoList.get_page(PAGE_SIZE, cursor, dynamodb)
+        scanned += len(items)
+        updated += sum(backfill_item(table, item, owners) for item in items)
+        if cursor is None or _out_of_time():
+            break
+    logger.info('backfill', extra=jsonlogger.with_fields(
+        scanned=scanned, updated=updated))
+    return {'scanned': scanned, 'updated': updated, 'cursor': cursor}
@@ -0,0 +1,43 @@
+import coldstart
+import awsclients
+import jsonlogger
+import importlib
+
+# (httpMethod, resource) -> 'module.function' of the handler that serves it
+ROUTES = {
+    ('POST', '/todos'): 'create.create',
+    ('GET', '/todos'): 'list.list',
+    ('GET', '/todos/export'): 'export.export',
+    ('GET', '/todos/changes'): 'changes.changes',
+    ('POST', '/todos/batch'): 'batch.create',
+    ('DELETE', '/todos/batch'): 'batch.delete',
+    ('GET', '/todos/translate/{language}'): 'translate.translate_list',
+    ('GET', '/todos/{id}'): 'get.get',
+    ('PUT', '/todos/{id}'): 'update.update',
+    ('DELETE', '/todos/{id}'): 'delete.delete',
+    ('GET', '/todos/{id}/{language}'): 'translate.translate',
+}
+
+_handlers = {}
+
+
+def _resolve(route):
+    # Handler modules are imported the first time their route is used
+    if route not in _handlers:
+        module, function = ROUTES[route].rsplit('.', 1)
+        coldstart.mark_import(module)
+        _handlers[route] = getattr(importlib.import_module(module), function)
+    return _handlers[route]
+
+
+@coldstart.profile
+@jsonlogger.correlated
+@awsclients.deadline
+def handle(event, context):
+    route = (event.get('httpMethod'), event.get('resource'))
+    if route not in ROUTES:
+        return {
+            "statusCode": 404,
+            "body": ""
+        }
+    return _resolve(route)(event, context)
@@ -0,0 +1,32 @@
+import decimal
+import json
+
+# Optional fast JSON backend, used when it is installed in the package
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def _default(obj):
+    # DynamoDB returns every number as Decimal and number sets as set.
+    # Integral values stay ints, fractional ones are not truncated.
+    if isinstance(obj, decimal.Decimal):
+        numerator, denominator = obj.as_integer_ratio()
+        return numerator if denominator == 1 else float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj)
+    raise TypeError('Object of type %s is not JSON serializable'
+                    % type(obj).__name__)
+
+
+def _dumps_json(obj):
+    return json.dumps(obj, default=_default)
+
+
+def _dumps_orjson(obj):  # pragma: no cover
+    return orjson.dumps(obj, default=_default).decode('utf-8')
+
+
+# Converts DynamoDB types while encoding, in a single pass over the items
+dumps = _dumps_orjson if orjson else _dumps_json
@@ -0,0 +1,69 @@
+import copy
+import threading
+
+
+class _Call(object):
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.waiters = 0
+        self.result = None
+        self.error = None
+
+
+class Group(object):
+    # Concurrent calls with the same key share a single execution: the
+    # first one runs the function, the rest wait for it and get a copy of
+    # its result (or its exception).
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executed = 0
+        self.collapsed = 0
+
+    def do(self, key, function, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                call.waiters += 1
+                self.collapsed += 1
+        if leader:
+            return self._run(key, call, function, args, kwargs)
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        # Every caller may modify what it gets back
+        return copy.deepcopy(call.result)
+
+    def _run(self, key, call, function, args, kwargs):
+        try:
+            result = function(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            self._finish(key, call)
+            raise
+        self._finish(key, call, result)
+        return result
+
+    def _finish(self, key, call, result=None):
+        # Calls made from now on run again, the waiting ones are released
+        with self._lock:
+            del self._calls[key]
+            waiters = call.waiters
+        if waiters and call.error is None:
+            # Snapshot before the leader's caller can change it
+            call.result = copy.deepcopy(result)
+        call.done.set()
+
+    def stats(self):
+        return {'executed': self.executed, 'collapsed': self.collapsed,
+                'inFlight': len(self._calls)}
+
+    def reset(self):
+        with self._lock:
+            self.executed = self.collapsed = 0
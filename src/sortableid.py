@@ -0,0 +1,48 @@
+import os
+import time
+import threading
+
+# ULID style ids: 48 bits of epoch milliseconds followed by 80 random bits,
+# written as 26 Crockford base32 characters. They sort by creation time as
+# plain strings, so they can be compared and range-queried like createdAt.
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+LENGTH = 26
+RANDOM_BITS = 80
+
+_lock = threading.Lock()
+_last = {'ms': -1, 'random': 0}
+
+
+def now_ms():
+    # Timestamps of the todo items are stored as integer milliseconds
+    return int(time.time() * 1000)
+
+
+def _encode(value):
+    chars = []
+    for _ in range(LENGTH):
+        value, index = divmod(value, 32)
+        chars.append(ALPHABET[index])
+    return ''.join(reversed(chars))
+
+
+def new(ms=None):
+    # Ids created in the same millisecond (or while the clock goes back)
+    # reuse the last timestamp and increment its random part, so they are
+    # still strictly increasing within this container
+    ms = now_ms() if ms is None else ms
+    with _lock:
+        if ms <= _last['ms']:
+            ms, random = _last['ms'], _last['random'] + 1
+        else:
+            random = int.from_bytes(os.urandom(RANDOM_BITS // 8), 'big')
+        _last['ms'], _last['random'] = ms, random
+    return _encode((ms << RANDOM_BITS) | random)
+
+
+def timestamp(key):
+    # Milliseconds encoded in an id created by new()
+    value = 0
+    for char in key.upper():
+        value = value * 32 + ALPHABET.index(char)
+    return value >> RANDOM_BITS
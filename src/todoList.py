@@ -1,68 +1,394 @@
 import os
-import boto3
 import time
-import uuid
 import json
+import base64
+import decimal
+import binascii
+import heapq
 import functools
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from botocore.exceptions import ClientError
-import logging
+import awsclients
+import jsonlogger
+import metrics
+import serializer
+import dynamobatch
+import translationcache
+import writequeue
+import singleflight
+import itemcache
+import sortableid
 
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+logger = jsonlogger.get_logger()
+
+# Attributes of a todo item that callers may project
+FIELDS = ('id', 'text', 'checked', 'createdAt', 'updatedAt', 'version')
+
+# Global secondary indexes. Booleans can not be index keys, so 'checked'
+# is mirrored in a 'status' attribute ('open' or 'done').
+OWNER_INDEX = 'owner-createdAt-index'
+STATUS_INDEX = 'status-createdAt-index'
+
+# Comprehend limit per batch call and concurrent Translate calls
+MAX_DETECT_BATCH = 25
+TRANSLATE_WORKERS = 8
+
+# Items per call of the bulk translation, the cursor resumes it
+TRANSLATE_PAGE = 100
+
+# Latency budget of translate_item (seconds) and per stage timeouts.
+# The default budget leaves room inside the 3 second Lambda timeout.
+TRANSLATE_BUDGET = 2.5
+READ_TIMEOUT = 1.0
+TRANSLATE_TIMEOUT = 2.0
+
+# Reused by every translate_item call of a warm container
+_pipeline = ThreadPoolExecutor(max_workers=4)
+
+# Concurrent identical reads of a warm container share one backend call
+_flights = singleflight.Group()
+
+
+class TranslateTimeout(Exception):
+    pass
+
+
+class VersionConflict(Exception):
+    # The item was changed since the client read it
+
+    def __init__(self, item):
+        super().__init__('version %s of %s is current' % (
+            item.get('version'), item['id']))
+        self.item = item
 
 
 def get_table(dynamodb=None):
-    if not dynamodb:
-        URL = os.environ['ENDPOINT_OVERRIDE']
-        if URL:  # pragma: no cover
-            print('URL dynamoDB:'+URL)
-            boto3.client = functools.partial(boto3.client, endpoint_url=URL)
-            boto3.resource = functools.partial(boto3.resource,
-                                               endpoint_url=URL)
-        dynamodb = boto3.resource("dynamodb", region_name='us-east-1')
-    # fetch todo from the database
-    table = dynamodb.Table(os.environ['DYNAMODB_TABLE'])
-    return table
+    if dynamodb:
+        return dynamodb.Table(os.environ['DYNAMODB_TABLE'])
+    # Reuse the Table cached for this container (keyed by region,
+    # endpoint and table name) instead of building a new resource per call
+    return awsclients.get_table(
+        os.environ['DYNAMODB_TABLE'],
+        endpoint=os.environ.get('ENDPOINT_OVERRIDE'))
+
+
+def _cache_key(table, key):
+    return '%s/%s' % (table.name, key)
+
+
+def parse_fields(value):
+    # 'id,checked' from a query string, validated against FIELDS
+    if not value:
+        return None
+    fields = [field for field in value.split(',') if field]
+    if not fields or not set(fields) <= set(FIELDS):
+        raise ValueError('fields must be a subset of ' + ','.join(FIELDS))
+    return fields
 
 
-def get_item(key, dynamodb=None):
+def _only(item, fields):
+    # Drops the attributes that were only read to sort or match items
+    if not fields:
+        return item
+    return {name: value for name, value in item.items() if name in fields}
+
+
+def get_item(key, dynamodb=None, fields=None):
     table = get_table(dynamodb)
+    # Hot items are served from the optional read-through cache
+    cached = itemcache.get(_cache_key(table, key))
+    if cached is not None:
+        return _only(cached, fields)
+    return _flights.do(('GetItem', table.name, key, tuple(fields or ())),
+                       _get_item, table, key, fields)
+
+
+def _get_item(table, key, fields=None):
     try:
-        result = table.get_item(
-            Key={
-                'id': key
-            }
-        )
+        with metrics.operation('GetItem') as op:
+            result = op.record(table.get_item(
+                Key={
+                    'id': key
+                },
+                **_projection_args(fields),
+                **metrics.capacity_args()
+            ))
 
     except ClientError as e:
-        print(e.response['Error']['Message'])
+        logger.error('getItem failed: %s', e.response['Error']['Message'])
     else:
-        print('Result getItem:'+str(result))
+        logger.debug('getItem', extra=jsonlogger.sampled(
+            id=key, found='Item' in result))
         if 'Item' in result:
+            if not fields:
+                itemcache.put(_cache_key(table, key), result['Item'])
             return result['Item']
 
 
-def get_items(dynamodb=None):
+def _scan_pages(scan, **kwargs):
+    # Follows LastEvaluatedKey so results past 1 MB are not truncated
+    while True:
+        result = scan(**kwargs)
+        yield result
+        if 'LastEvaluatedKey' not in result:
+            return
+        kwargs['ExclusiveStartKey'] = result['LastEvaluatedKey']
+
+
+def iter_items(dynamodb=None, page_size=None):
+    # Lazily walks every page of the table, one scan call at a time
+    kwargs = {'Limit': page_size} if page_size else {}
+    for page in _scan_pages(get_table(dynamodb).scan, **kwargs):
+        yield from page['Items']
+
+
+def _projection_args(fields, required=()):
+    if not fields:
+        return {}
+    fields = list(dict.fromkeys(list(fields) + list(required)))
+    # Placeholders avoid clashes with reserved words such as 'text'
+    names = {'#f%d' % i: field for i, field in enumerate(fields)}
+    return {
+        'ProjectionExpression': ', '.join(names),
+        'ExpressionAttributeNames': names,
+    }
+
+
+def _project(kwargs, fields, required=()):
+    # Adds a projection to query arguments that already use names
+    projection = _projection_args(fields, required)
+    if projection:
+        kwargs['ProjectionExpression'] = projection['ProjectionExpression']
+        kwargs.setdefault('ExpressionAttributeNames', {}).update(
+            projection['ExpressionAttributeNames'])
+    return kwargs
+
+
+def _segment_page(scan, segment, key):
+    if key is None:
+        return scan(Segment=segment)
+    return scan(Segment=segment, ExclusiveStartKey=key)
+
+
+def scan_segments(pending, segments, limit=None, fields=None, dynamodb=None,
+                  workers=None):
+    # One page of each [segment, start key] in pending, scanned in
+    # parallel. Returns the items and the pairs of the segments that have
+    # more pages, so an export can be split in several calls.
     table = get_table(dynamodb)
-    # fetch todo from the database
-    result = table.scan()
-    return result['Items']
+    kwargs = _projection_args(fields)
+    if limit:
+        kwargs['Limit'] = limit
+    # Low level clients are thread safe, resources are not
+    scan = functools.partial(table.meta.client.scan, TableName=table.name,
+                             TotalSegments=segments, **kwargs)
+    with ThreadPoolExecutor(max_workers=workers or len(pending)) as pool:
+        pages = list(pool.map(lambda p: _segment_page(scan, *p), pending))
+    items = [item for page in pages for item in page['Items']]
+    left = [[segment, page['LastEvaluatedKey']]
+            for (segment, _), page in zip(pending, pages)
+            if 'LastEvaluatedKey' in page]
+    return items, left
+
+
+def scan_all(segments=4, workers=None, fields=None, dynamodb=None):
+    # Library API for jobs that walk the whole table in one process (the
+    # export endpoint pages with scan_segments instead, so each response
+    # stays small). Built on scan_segments: one page per segment is held
+    # at a time, and closing the generator stops after the current round.
+    pending = [[segment, None] for segment in range(segments)]
+    while pending:
+        items, pending = scan_segments(pending, segments, None, fields,
+                                       dynamodb, workers)
+        yield from items
+
+
+def get_items(dynamodb=None, fields=None):
+    table = get_table(dynamodb)
+    return _flights.do(('Scan', table.name, tuple(fields or ())),
+                       _get_items, table, fields)
+
 
+def _get_items(table, fields=None):
+    # fetch all todos from the database
+    items = []
+    with metrics.operation('Scan') as op:
+        for page in _scan_pages(table.scan, **_projection_args(fields),
+                                **metrics.capacity_args()):
+            items.extend(op.record(page)['Items'])
+    return items
 
-def put_item(text, dynamodb=None):
+
+def get_items_by_ids(keys, dynamodb=None, fields=None):
+    # Fetches many todos with BatchGetItem, keeping the caller's order.
+    # Ids that do not exist are left out.
     table = get_table(dynamodb)
-    timestamp = str(time.time())
-    print('Table name:' + table.name)
+    keys = list(dict.fromkeys(keys))
+    items = dynamobatch.get(table.meta.client, table.name,
+                            [{'id': key} for key in keys],
+                            projection=_projection_args(fields, ('id',)))
+    by_id = {item['id']: item for item in items}
+    return [_only(by_id[key], fields) for key in keys if key in by_id]
+
+
+def _since(since):
+    # createdAt is stored as epoch milliseconds
+    try:
+        return int(since)
+    except (TypeError, ValueError):
+        raise ValueError('since must be a timestamp in milliseconds')
+
+
+def _query_args(owner, checked, since):
+    names = {'#created': 'createdAt'}
+    values = {}
+    if owner:
+        index, names['#key'], values[':key'] = OWNER_INDEX, 'owner', owner
+    else:
+        index, names['#key'] = STATUS_INDEX, 'status'
+        values[':key'] = item_status(checked)
+    condition = '#key = :key'
+    if since:
+        condition += ' AND #created >= :since'
+        values[':since'] = _since(since)
+    kwargs = {'IndexName': index, 'KeyConditionExpression': condition}
+    if owner and checked is not None:
+        names['#status'] = 'status'
+        values[':status'] = item_status(checked)
+        kwargs['FilterExpression'] = '#status = :status'
+    kwargs['ExpressionAttributeNames'] = names
+    kwargs['ExpressionAttributeValues'] = values
+    return kwargs
+
+
+def query_items(owner=None, checked=None, since=None, dynamodb=None,
+                fields=None):
+    # Reads through a global secondary index instead of scanning the table,
+    # so the cost follows the size of the result. Results are sorted by
+    # createdAt.
+    if not owner and checked is None:
+        raise ValueError('owner or checked is required')
+    items = []
+    with metrics.operation('Query') as op:
+        for page in _scan_pages(get_table(dynamodb).query,
+                                **_project(_query_args(owner, checked,
+                                                       since), fields),
+                                **metrics.capacity_args()):
+            items.extend(op.record(page)['Items'])
+    return items
+
+
+def _partition(query, op, checked, since, limit, fields):
+    # One status partition of the index, stopping as soon as limit items
+    # have been read: newest first, or oldest first from since
+    kwargs = _project(_query_args(None, checked, since), fields,
+                      ('id', 'createdAt'))
+    kwargs['ScanIndexForward'] = since is not None
+    if limit:
+        kwargs['Limit'] = limit
+    items = []
+    for page in _scan_pages(query, **kwargs, **metrics.capacity_args()):
+        items.extend(op.record(page)['Items'])
+        if limit and len(items) >= limit:
+            break
+    return items
+
+
+def recent_items(since=None, limit=None, dynamodb=None, fields=None):
+    # Newest todos first or, with since, the oldest ones created at or
+    # after it. Syncing clients pass the createdAt of the last item they
+    # got as the next since, so with a limit nothing is skipped (items of
+    # that same millisecond come again). Every item lives in one of the two
+    # partitions of the status index, which are read and merged.
+    query = get_table(dynamodb).query
+    with metrics.operation('Query') as op:
+        partitions = [_partition(query, op, checked, since, limit, fields)
+                      for checked in (False, True)]
+    items = list(heapq.merge(*partitions, reverse=since is None,
+                             key=lambda item: (item['createdAt'],
+                                               item['id'])))
+    return [_only(item, fields) for item in items[:limit or None]]
+
+
+def encode_cursor(key):
+    if not key:
+        return None
+    raw = serializer.dumps(key)
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_state(cursor):
+    # Any value written with encode_cursor, callers validate it
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')),
+                          parse_float=decimal.Decimal)
+    except (binascii.Error, UnicodeError, ValueError):
+        raise ValueError('Invalid cursor: ' + cursor)
+
+
+def is_scan_key(key):
+    return (isinstance(key, dict) and list(key) == ['id'] and
+            isinstance(key['id'], str))
+
+
+def decode_cursor(cursor):
+    key = decode_state(cursor)
+    # Only keys of the table scan are accepted, anything else would get
+    # to DynamoDB as a bad ExclusiveStartKey
+    if not is_scan_key(key):
+        raise ValueError('Invalid cursor: ' + cursor)
+    return key
+
+
+def get_page(limit=None, cursor=None, dynamodb=None, fields=None):
+    # Returns one page of todos and the opaque cursor of the next one
+    kwargs = _projection_args(fields)
+    if limit:
+        kwargs['Limit'] = limit
+    if cursor:
+        kwargs['ExclusiveStartKey'] = decode_cursor(cursor)
+    table = get_table(dynamodb)
+    result = _flights.do(('ScanPage', table.name, limit, cursor,
+                          tuple(fields or ())),
+                         _scan_page, table, kwargs)
+    return result['Items'], encode_cursor(result.get('LastEvaluatedKey'))
+
+
+def _scan_page(table, kwargs):
+    with metrics.operation('Scan') as op:
+        return op.record(table.scan(**kwargs, **metrics.capacity_args()))
+
+
+def item_status(checked):
+    # 'checked' arrives as a boolean or as the string sent by the client
+    return 'done' if str(checked).lower() == 'true' else 'open'
+
+
+def _new_item(text, owner=None):
+    timestamp = sortableid.now_ms()
     item = {
-        'id': str(uuid.uuid1()),
+        'id': sortableid.new(timestamp),
         'text': text,
         'checked': False,
+        'status': item_status(False),
         'createdAt': timestamp,
         'updatedAt': timestamp,
+        'version': 1,
     }
+    if owner:
+        # Items without owner are left out of the (sparse) owner index
+        item['owner'] = owner
+    return item
+
+
+def put_item(text, dynamodb=None, owner=None):
+    table = get_table(dynamodb)
+    item = _new_item(text, owner)
     try:
         # write the todo to the database
-        table.put_item(Item=item)
+        with metrics.operation('PutItem') as op:
+            op.record(table.put_item(Item=item, **metrics.capacity_args()))
         # create a response
         response = {
             "statusCode": 200,
@@ -70,37 +396,82 @@ def put_item(text, dynamodb=None):
         }
 
     except ClientError as e:
-        print(e.response['Error']['Message'])
+        logger.error('putItem failed: %s', e.response['Error']['Message'])
     else:
         return response
 
 
-def update_item(key, text, checked, dynamodb=None):
+def _update_args(key, text, checked, version):
+    values = {
+        ':text': text,
+        ':checked': checked,
+        ':status': item_status(checked),
+        ':updatedAt': sortableid.now_ms(),
+        ':zero': 0,
+        ':one': 1,
+    }
+    # Never create an item, and with an expected version only apply the
+    # update if nobody changed the item since the client read it. Items
+    # created before versioning are at version 0.
+    condition = 'attribute_exists(id)'
+    if version is not None:
+        condition += (' AND ((attribute_not_exists(version) AND '
+                      ':version = :zero) OR version = :version)')
+        values[':version'] = version
+    return {
+        'Key': {
+            'id': key
+        },
+        'ExpressionAttributeNames': {
+          '#todo_text': 'text',
+          '#lang': 'lang',
+          '#status': 'status',
+        },
+        'ExpressionAttributeValues': values,
+        # The detected language is no longer valid for the new text.
+        # Items created before versioning start counting from 0.
+        'UpdateExpression': 'SET #todo_text = :text, '
+                            'checked = :checked, '
+                            '#status = :status, '
+                            'updatedAt = :updatedAt, '
+                            'version = if_not_exists(version, :zero) + :one '
+                            'REMOVE #lang',
+        'ConditionExpression': condition,
+    }
+
+
+def _check_conflict(table, key, version):
+    # A failed condition means either a missing item or a stale version
+    if version is None:
+        return
+    current = table.get_item(Key={'id': key}, ConsistentRead=True)
+    if 'Item' in current:
+        raise VersionConflict(current['Item'])
+
+
+def update_item(key, text, checked, dynamodb=None, version=None):
+    # Returns the updated item, or None if it does not exist. Raises
+    # VersionConflict if version is given and no longer current, and the
+    # ClientError of any other failure.
     table = get_table(dynamodb)
-    timestamp = int(time.time() * 1000)
     # update the todo in the database
     try:
-        result = table.update_item(
-            Key={
-                'id': key
-            },
-            ExpressionAttributeNames={
-              '#todo_text': 'text',
-            },
-            ExpressionAttributeValues={
-              ':text': text,
-              ':checked': checked,
-              ':updatedAt': timestamp,
-            },
-            UpdateExpression='SET #todo_text = :text, '
-                             'checked = :checked, '
-                             'updatedAt = :updatedAt',
-            ReturnValues='ALL_NEW',
-        )
+        with metrics.operation('UpdateItem') as op:
+            result = op.record(table.update_item(
+                ReturnValues='ALL_NEW',
+                **_update_args(key, text, checked, version),
+                **metrics.capacity_args()
+            ))
 
     except ClientError as e:
-        print(e.response['Error']['Message'])
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            _check_conflict(table, key, version)
+            logger.info('updateItem: %s not found', key)
+            return None
+        logger.error('updateItem failed: %s', e.response['Error']['Message'])
+        raise
     else:
+        itemcache.invalidate(_cache_key(table, key))
         return result['Attributes']
 
 
@@ -108,18 +479,126 @@ def delete_item(key, dynamodb=None):
     table = get_table(dynamodb)
     # delete the todo from the database
     try:
-        table.delete_item(
-            Key={
-                'id': key
-            }
-        )
+        with metrics.operation('DeleteItem') as op:
+            op.record(table.delete_item(
+                Key={
+                    'id': key
+                },
+                **metrics.capacity_args()
+            ))
 
     except ClientError as e:
-        print(e.response['Error']['Message'])
+        logger.error('deleteItem failed: %s',
+                     e.response['Error']['Message'])
     else:
+        itemcache.invalidate(_cache_key(table, key))
         return
 
 
+def _batch_results(keys, failed, status):
+    failed = set(failed)
+    return [{'id': key, 'status': 'failed' if key in failed else status}
+            for key in keys]
+
+
+def _write_items(items, dynamodb=None):
+    # Puts items with BatchWriteItem, returns the ids that failed
+    table = get_table(dynamodb)
+    failed = dynamobatch.write(
+        table.meta.client, table.name,
+        [{'PutRequest': {'Item': item}} for item in items])
+    return [request['PutRequest']['Item']['id'] for request in failed]
+
+
+def put_items(texts, dynamodb=None, owner=None):
+    # Creates many todos with BatchWriteItem, returns one result per text
+    items = [_new_item(text, owner) for text in texts]
+    results = _batch_results(
+        [item['id'] for item in items],
+        _write_items(items, dynamodb),
+        'created')
+    for result, item in zip(results, items):
+        result['item'] = item
+    return results
+
+
+def enqueue_item(text, owner=None):
+    # Async create: the id is assigned now, the write happens when the
+    # queue is drained by flush_queued
+    item = _new_item(text, owner)
+    writequeue.send(item)
+    return item
+
+
+def _redelivered(record):
+    attributes = record.get('attributes') or {}
+    return int(attributes.get('ApproximateReceiveCount', '1')) > 1
+
+
+def _stored(keys, dynamodb=None):
+    # Ids among keys that are already in the table
+    if not keys:
+        return set()
+    table = get_table(dynamodb)
+    items = dynamobatch.get(table.meta.client, table.name,
+                            [{'id': key} for key in keys],
+                            projection={'ProjectionExpression': 'id',
+                                        'ConsistentRead': True})
+    return {item['id'] for item in items}
+
+
+def flush_queued(records, dynamodb=None):
+    # Writes queued items (SQS shaped records) in batches of 25, returns
+    # the messageId of the records that could not be written
+    items = [json.loads(record['body']) for record in records]
+    # A redelivered message may have been written already, and the item
+    # updated since: writing it again would undo those updates
+    stored = _stored(list({item['id'] for record, item in zip(records, items)
+                           if _redelivered(record)}), dynamodb)
+    # SQS may deliver a message twice, a batch can not repeat a key
+    unique = {item['id']: item for item in items if item['id'] not in stored}
+    failed = set(_write_items(list(unique.values()), dynamodb))
+    return [record['messageId']
+            for record, item in zip(records, items) if item['id'] in failed]
+
+
+def delete_items(keys, dynamodb=None):
+    # Deletes many todos with BatchWriteItem, returns one result per id
+    table = get_table(dynamodb)
+    # A batch can not contain the same key twice
+    keys = list(dict.fromkeys(keys))
+    failed = dynamobatch.write(
+        table.meta.client, table.name,
+        [{'DeleteRequest': {'Key': {'id': key}}} for key in keys])
+    for key in keys:
+        itemcache.invalidate(_cache_key(table, key))
+    return _batch_results(
+        keys,
+        [request['DeleteRequest']['Key']['id'] for request in failed],
+        'deleted')
+
+
+def _index_definition(name, hash_key):
+    # For unit testing, same indexes as template.yaml
+    return {
+        'IndexName': name,
+        'KeySchema': [
+            {'AttributeName': hash_key, 'KeyType': 'HASH'},
+            {'AttributeName': 'createdAt', 'KeyType': 'RANGE'},
+        ],
+        'Projection': {'ProjectionType': 'ALL'},
+        'ProvisionedThroughput': {
+            'ReadCapacityUnits': 1,
+            'WriteCapacityUnits': 1
+        }
+    }
+
+
+def coalescing_stats():
+    # How many reads ran and how many joined one already in flight
+    return _flights.stats()
+
+
 def create_todo_table(dynamodb):
     # For unit testing
     tableName = os.environ['DYNAMODB_TABLE']
@@ -136,8 +615,24 @@ def create_todo_table(dynamodb):
             {
                 'AttributeName': 'id',
                 'AttributeType': 'S'
+            },
+            {
+                'AttributeName': 'owner',
+                'AttributeType': 'S'
+            },
+            {
+                'AttributeName': 'status',
+                'AttributeType': 'S'
+            },
+            {
+                'AttributeName': 'createdAt',
+                'AttributeType': 'N'
             }
         ],
+        GlobalSecondaryIndexes=[
+            _index_definition(OWNER_INDEX, 'owner'),
+            _index_definition(STATUS_INDEX, 'status'),
+        ],
         ProvisionedThroughput={
             'ReadCapacityUnits': 1,
             'WriteCapacityUnits': 1
@@ -157,10 +652,9 @@ def create_todo_table(dynamodb):
 def get_comprehend(comprehend=None):  # pragma: no cover
     if not comprehend:
         url_comprehend = 'https://comprehend.us-east-1.amazonaws.com/'
-        comprehend = boto3.client(service_name='comprehend',
-                                  endpoint_url=url_comprehend)
+        comprehend = awsclients.get_client('comprehend',
+                                           endpoint=url_comprehend)
     logger.debug("Obteniendo comprehend")
-    logger.debug(comprehend)
     return comprehend
 
 
@@ -168,28 +662,25 @@ def get_comprehend(comprehend=None):  # pragma: no cover
 def get_translate(translate=None):  # pragma: no cover
     if not translate:
         url_translate = 'https://translate.us-east-1.amazonaws.com/'
-        translate = boto3.client(service_name='translate',
-                                 endpoint_url=url_translate)
+        translate = awsclients.get_client('translate',
+                                          endpoint=url_translate)
     logger.debug("Obteniendo translate")
-    logger.debug(translate)
     return translate
 
 
 # Detecta el lenguaje original del texto.
 def get_item_languaje(text, comprehend=None):  # pragma: no cover
     comprehend = get_comprehend(comprehend)
-    logger.info(comprehend)
     try:
-        logger.info("Detect text lang: " + str(text))
+        logger.debug("Detect text lang: %s", text)
         response = comprehend.detect_dominant_language(
                 Text=text
         )
-    except ClientError as e:
+    except ClientError:
         logger.exception("Couldn't detect languages.")
-        print(e.response['Error']['Message'])
     else:
         languages = response['Languages']
-        logger.info("Detected %s languages.", len(languages))
+        logger.debug("Detected %s languages.", len(languages))
 
         # Ordeno la lista de lenguajes por el mejor score
         order_languaje = sorted(
@@ -203,64 +694,240 @@ def get_item_languaje(text, comprehend=None):  # pragma: no cover
 
 # Realiza el traslate del texto.
 def translate_text(text, s_lang, t_lang, translate=None):  # pragma: no cover
-    logging.info('get translateclient --------------------')
+    if s_lang == t_lang:
+        # El texto ya esta en el lenguaje destino
+        return text
     translate = get_translate(translate)
-    logging.debug('TRASLATE CLIENTE  --------------------')
-    logger.debug(translate)
-
     try:
-        logger.debug(translate)
-        logger.debug("texto: " + text)
-        logger.debug("Lenguaje entrada: " + str(s_lang))
-        logger.debug("Lenguaje salida: " + str(t_lang))
+        logger.debug("Traduccion %s -> %s: %s", s_lang, t_lang, text)
 
         response = translate.translate_text(
                 Text=text,
                 SourceLanguageCode=s_lang,
                 TargetLanguageCode=t_lang
         )
-    except ClientError as e:
+    except ClientError:
         logger.exception("No fue posible realizar la traduccion")
-        print(e.response['Error']['Message'])
-        print(e)
 
     else:
-        logger.debug("traduccion.")
-        logger.debug(response)
+        logger.debug("traduccion: %s", response['TranslatedText'])
         return str(response['TranslatedText'])
 
 
-# pre requisitos: ID y Lenguaje
-def translate_item(key, language, dynamodb=None):  # pragma: no cover
-    logging.info('inicio translate (translate_item) --------------------')
+# Guarda el lenguaje detectado, solo si el texto no cambio mientras tanto
+def set_item_language(item, language, dynamodb=None):
+    table = get_table(dynamodb)
     try:
-        logging.debug('Llamo funcion get_item --------------------')
-        item = get_item(key, dynamodb)
-        if item:
-            logging.debug('Respuesta funcion get_item --------------------')
-            thetext = item['text']
-            logging.debug(item)
-            logging.debug(thetext)
-            logging.debug('source languaje --------------------')
-            # Obtiene el longuaje del texto (Lenguaje Origen)
-            source_language = get_item_languaje(thetext)
-            logging.debug(source_language)
-            translateresult = translate_text(
-                    thetext,
-                    source_language,
-                    language
-            )
-
-            logging.debug("Translation output: " + str(translateresult))
-            # Actualizo texto traducido
-            item['text'] = translateresult
-            logging.debug("Item Traslate:")
-            logging.debug(item)
-
+        # Low level client, the bulk translation calls it from its threads
+        table.meta.client.update_item(
+            TableName=table.name,
+            Key={
+                'id': item['id']
+            },
+            ExpressionAttributeNames={
+              '#lang': 'lang',
+            },
+            ExpressionAttributeValues={
+              ':lang': language,
+              ':updatedAt': item['updatedAt'],
+            },
+            UpdateExpression='SET #lang = :lang',
+            ConditionExpression='updatedAt = :updatedAt',
+        )
     except ClientError as e:
-        logger.exception("Couldn't translate.")
-        print(e.response['Error']['Message'])
+        logger.debug('lang not stored: %s', e.response['Error']['Message'])
     else:
+        itemcache.invalidate(_cache_key(table, item['id']))
+        item['lang'] = language
         return item
 
+
+# Lenguaje origen del item: el guardado o se detecta una sola vez
+def get_source_language(item, dynamodb=None):  # pragma: no cover
+    if item.get('lang'):
+        return item['lang']
+    source_language = get_item_languaje(item['text'])
+    if source_language:
+        set_item_language(item, source_language, dynamodb)
+    return source_language
+
+
+# Traduce el texto del item, usando la cache de traducciones si existe.
+# La cache guarda traducciones desde el lenguaje detectado, asi que no se
+# usa cuando el cliente indica otro origen.
+def _translate_cached(item, language, dynamodb=None,
+                      source=None):  # pragma: no cover
+    if source:
+        return translate_text(item['text'], source, language)
+    translateresult = translationcache.get(item, language, dynamodb)
+    if translateresult is not None:
+        logger.debug('Traduccion obtenida de la cache')
+        return translateresult
+    # Lenguaje origen: el guardado o detectado
+    source_language = get_source_language(item, dynamodb)
+    logger.debug('source languaje: %s', source_language)
+    translateresult = translate_text(
+            item['text'],
+            source_language,
+            language
+    )
+    if translateresult is not None:
+        translationcache.put(item, language, translateresult, dynamodb)
+    return translateresult
+
+
+# Espera una etapa sin pasarse de su timeout ni del presupuesto total
+def _wait_stage(future, deadline, timeout):
+    remaining = deadline - time.monotonic()
+    try:
+        return future.result(timeout=max(0, min(remaining, timeout)))
+    except FutureTimeoutError:
+        raise TranslateTimeout('Translation latency budget exhausted')
+
+
+# pre requisitos: ID y Lenguaje
+def translate_item(key, language, dynamodb=None,
+                   source=None, budget=None):  # pragma: no cover
+    # Las traducciones concurrentes del mismo item comparten la llamada
+    table = get_table(dynamodb)
+    return _flights.do(('TranslateItem', table.name, key, language, source),
+                       _translate_item, key, language, dynamodb, source,
+                       budget)
+
+
+def _translate_item(key, language, dynamodb=None,
+                    source=None, budget=None):  # pragma: no cover
+    logger.debug('inicio translate (translate_item)')
+    if budget is None:
+        budget = TRANSLATE_BUDGET
+    deadline = time.monotonic() + budget
+    with metrics.operation('TranslateItem'):
+        try:
+            pending_item = _pipeline.submit(get_item, key, dynamodb)
+            # Mientras se lee el item se preparan los clientes
+            _pipeline.submit(get_translate)
+            if not source:
+                _pipeline.submit(get_comprehend)
+            item = _wait_stage(pending_item, deadline, READ_TIMEOUT)
+            if item:
+                translateresult = _wait_stage(
+                    _pipeline.submit(_translate_cached, item, language,
+                                     dynamodb, source),
+                    deadline, TRANSLATE_TIMEOUT)
+                logger.debug("Translation output: %s", translateresult)
+                # Actualizo texto traducido
+                item['text'] = translateresult
+
+        except ClientError:
+            logger.exception("Couldn't translate.")
+        else:
+            return item
+
+
+# Elige el lenguaje con mejor score
+def _best_language(languages):
+    return max(languages, key=lambda k: k['Score'])['LanguageCode']
+
+
+# Detecta un lote de textos, None en los que Comprehend no pudo
+def _detect_batch(texts, comprehend):
+    languages = [None] * len(texts)
+    try:
+        response = comprehend.batch_detect_dominant_language(TextList=texts)
+    except ClientError:
+        logger.exception("Couldn't detect languages.")
+        return languages
+    for result in response['ResultList']:
+        languages[result['Index']] = _best_language(result['Languages'])
+    for error in response.get('ErrorList', []):
+        logger.warning('Lenguaje no detectado en %s: %s',
+                       error['Index'], error.get('ErrorMessage'))
+    return languages
+
+
+# Detecta el lenguaje de varios textos, de a 25 por llamada a Comprehend.
+# Los textos que fallan en el lote se detectan de a uno; si tampoco se
+# puede, su lenguaje queda en None.
+def detect_languages(texts, comprehend=None):
+    comprehend = get_comprehend(comprehend)
+    languages = []
+    for start in range(0, len(texts), MAX_DETECT_BATCH):
+        languages.extend(_detect_batch(
+                texts[start:start + MAX_DETECT_BATCH], comprehend))
+    return [language or get_item_languaje(text, comprehend)
+            for text, language in zip(texts, languages)]
+
+
+# Traduce un item de la traduccion masiva
+def _translate_one(item, language, detected, dynamodb, translate):
+    translateresult = translationcache.get(item, language, dynamodb)
+    if translateresult is None:
+        if detected:
+            set_item_language(item, detected, dynamodb)
+        source_language = item.get('lang') or detected
+        if not source_language:
+            # Sin lenguaje origen el item queda sin traducir (text None),
+            # el resto de la lista sigue
+            logger.warning('Lenguaje origen desconocido: %s', item['id'])
+            item['text'] = None
+            return item
+        translateresult = translate_text(
+                item['text'],
+                source_language,
+                language,
+                translate
+        )
+        if translateresult is not None:
+            translationcache.put(item, language, translateresult, dynamodb)
+    item['text'] = translateresult
+    return item
+
+
+# Items de una llamada de la traduccion masiva y el cursor siguiente. Con
+# ids el cursor es el ultimo id traducido, como el de un scan.
+def _translate_page(keys, limit, cursor, dynamodb):
+    if not keys:
+        return get_page(limit, cursor, dynamodb)
+    if cursor:
+        last = decode_cursor(cursor)['id']
+        if last not in keys:
+            raise ValueError('Invalid cursor: ' + cursor)
+        keys = keys[keys.index(last) + 1:]
+    items = get_items_by_ids(keys[:limit], dynamodb) if keys else []
+    if len(keys) > limit and items:
+        return items, encode_cursor({'id': items[-1]['id']})
+    return items, None
+
+
+# Quedan menos segundos de los que puede tardar una llamada a Translate
+def _out_of_time():
+    left = awsclients.time_left()
+    return left is not None and left < TRANSLATE_TIMEOUT
+
+
+# Traduce una pagina de la lista (o de los ids indicados), varias llamadas
+# a Translate en paralelo. Devuelve los items en orden y el cursor para
+# seguir; si se acaba el tiempo de la lambda el cursor apunta al ultimo
+# item traducido.
+def translate_items(language, keys=None, dynamodb=None, comprehend=None,
+                    translate=None, limit=TRANSLATE_PAGE, cursor=None):
+    items, next_cursor = _translate_page(keys, limit, cursor, dynamodb)
+    missing = [item for item in items if not item.get('lang')]
+    detected = {}
+    if missing:
+        languages = detect_languages([i['text'] for i in missing], comprehend)
+        detected = {i['id']: lang for i, lang in zip(missing, languages)}
+    done = []
+    with ThreadPoolExecutor(max_workers=TRANSLATE_WORKERS) as pool:
+        for start in range(0, len(items), TRANSLATE_WORKERS):
+            if _out_of_time():
+                last = done[-1]['id'] if done else None
+                return done, encode_cursor({'id': last}) if last else cursor
+            done.extend(pool.map(
+                lambda item: _translate_one(item, language,
+                                            detected.get(item['id']),
+                                            dynamodb, translate),
+                items[start:start + TRANSLATE_WORKERS]))
+    return done, next_cursor
+
 # ------------------ TRASLATE FIN --------------------
@@ -1,29 +1,67 @@
-import logging
+import coldstart
+import awsclients
+import jsonlogger
 import todoList
+import dynamobatch
 import json
-import decimalencoder
+import serializer
 
+logger = jsonlogger.get_logger()
 
+# Seconds kept to build the response before the Lambda timeout
+SAFETY_MARGIN = 0.3
+
+
+def _budget(context):
+    if context is None or not hasattr(context,
+                                      'get_remaining_time_in_millis'):
+        return None
+    return context.get_remaining_time_in_millis() / 1000.0 - SAFETY_MARGIN
+
+
+def _limit(value):
+    # Items por llamada de la traduccion masiva
+    if value is None:
+        return todoList.TRANSLATE_PAGE
+    limit = int(value)
+    if not 0 < limit <= todoList.TRANSLATE_PAGE:
+        raise ValueError('limit must be between 1 and %d'
+                         % todoList.TRANSLATE_PAGE)
+    return limit
+
+
+@coldstart.profile
+@jsonlogger.correlated
+@awsclients.deadline
 def translate(event, context):
-    logging.info('inicio traducciones --------------------')
-    logging.debug(event)
+    logger.info('inicio traducciones --------------------')
+    logger.debug(event)
     if ('id' not in event['pathParameters'] or
             'language' not in event['pathParameters']):
-        logging.error("Validation Failed")
+        logger.error("Validation Failed")
         raise Exception("Couldn't translate the todo item.")
         # Ver dde agregar error reposnse statuscode: 400
 
-    # Obtiene el item de ToDo traducido
-    item = todoList.translate_item(event['pathParameters']['id'],
-                                   event['pathParameters']['language'])
-    logging.debug('resultado de la salida:')
-    logging.debug(item)
+    params = event.get('queryStringParameters') or {}
+    # Obtiene el item de ToDo traducido, dentro del tiempo de la lambda
+    try:
+        item = todoList.translate_item(event['pathParameters']['id'],
+                                       event['pathParameters']['language'],
+                                       source=params.get('source'),
+                                       budget=_budget(context))
+    except todoList.TranslateTimeout as e:
+        logger.error(str(e))
+        return {
+            "statusCode": 504,
+            "body": json.dumps({"message": str(e)})
+        }
+    logger.debug('resultado de la salida:')
+    logger.debug(item)
     # create a response
     if item:
         response = {
             "statusCode": 200,
-            "body": json.dumps(item,
-                               cls=decimalencoder.DecimalEncoder)
+            "body": serializer.dumps(item)
         }
     else:
         response = {
@@ -31,3 +69,37 @@ def translate(event, context):
             "body": ""
         }
     return response
+
+
+@coldstart.profile
+@jsonlogger.correlated
+@awsclients.deadline
+def translate_list(event, context):
+    logger.info('inicio traduccion masiva --------------------')
+    if 'language' not in (event.get('pathParameters') or {}):
+        logger.error("Validation Failed")
+        raise Exception("Couldn't translate the todo list.")
+    params = event.get('queryStringParameters') or {}
+    ids = [key for key in params.get('ids', '').split(',') if key]
+    # Obtiene una pagina de la lista de ToDo traducida
+    try:
+        items, cursor = todoList.translate_items(
+            event['pathParameters']['language'], ids or None,
+            limit=_limit(params.get('limit')), cursor=params.get('cursor'))
+    except ValueError as e:
+        return {
+            "statusCode": 400,
+            "body": json.dumps({"message": str(e)})
+        }
+    except dynamobatch.IncompleteRead as e:
+        logger.error(str(e))
+        return {
+            "statusCode": 503,
+            "body": json.dumps({"message": str(e)})
+        }
+    # create a response
+    response = {
+        "statusCode": 200,
+        "body": serializer.dumps({"items": items, "cursor": cursor})
+    }
+    return response
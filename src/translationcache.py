@@ -0,0 +1,107 @@
+import os
+import time
+import jsonlogger
+from botocore.exceptions import ClientError
+import awsclients
+import lrucache
+
+# Translations are keyed by item id, item updatedAt and target language,
+# so editing a todo invalidates its translations automatically.
+EXPIRATION_SECONDS = 30 * 24 * 3600
+
+logger = jsonlogger.get_logger()
+
+_memory = lrucache.LRUCache(
+    int(os.environ.get('TRANSLATION_CACHE_SIZE', '256')))
+
+
+def _key(item, language):
+    return (item['id'], str(item['updatedAt']), language)
+
+
+def get_table(dynamodb=None):
+    # The companion table is optional, without it only memory is used
+    name = os.environ.get('TRANSLATIONS_TABLE')
+    if not name:
+        return None
+    if dynamodb:
+        return dynamodb.Table(name)
+    return awsclients.get_table(
+        name, endpoint=os.environ.get('ENDPOINT_OVERRIDE'))
+
+
+def _load(key, dynamodb):
+    table = get_table(dynamodb)
+    if table is None:
+        return None
+    # Low level client, the cache is used from the bulk translation threads
+    try:
+        result = table.meta.client.get_item(
+            TableName=table.name, Key={'id': key[0], 'language': key[2]})
+    except ClientError as e:
+        logger.error('translation cache failed: %s',
+                     e.response['Error']['Message'])
+        return None
+    cached = result.get('Item')
+    if cached and cached['updatedAt'] == key[1]:
+        return cached['text']
+
+
+def _store(key, text, dynamodb):
+    table = get_table(dynamodb)
+    if table is None:
+        return
+    try:
+        table.meta.client.put_item(TableName=table.name, Item={
+            'id': key[0],
+            'language': key[2],
+            'updatedAt': key[1],
+            'text': text,
+            'expiresAt': int(time.time()) + EXPIRATION_SECONDS,
+        })
+    except ClientError as e:
+        logger.error('translation cache failed: %s',
+                     e.response['Error']['Message'])
+
+
+def get(item, language, dynamodb=None):
+    key = _key(item, language)
+    text = _memory.get(key)
+    if text is None:
+        text = _load(key, dynamodb)
+        if text is not None:
+            _memory.set(key, text)
+    return text
+
+
+def put(item, language, text, dynamodb=None):
+    key = _key(item, language)
+    _memory.set(key, text)
+    _store(key, text, dynamodb)
+
+
+def clear():
+    # For unit testing
+    _memory.clear()
+
+
+def create_translations_table(dynamodb):
+    # For unit testing
+    tableName = os.environ['TRANSLATIONS_TABLE']
+    table = dynamodb.create_table(
+        TableName=tableName,
+        KeySchema=[
+            {'AttributeName': 'id', 'KeyType': 'HASH'},
+            {'AttributeName': 'language', 'KeyType': 'RANGE'},
+        ],
+        AttributeDefinitions=[
+            {'AttributeName': 'id', 'AttributeType': 'S'},
+            {'AttributeName': 'language', 'AttributeType': 'S'},
+        ],
+        ProvisionedThroughput={
+            'ReadCapacityUnits': 1,
+            'WriteCapacityUnits': 1
+        }
+    )
+    table.meta.client.get_waiter('table_exists').wait(TableName=tableName)
+    return table
@@ -1,24 +1,78 @@
+import coldstart
+import awsclients
+import apigateway
 import json
-import logging
-import decimalencoder
+import jsonlogger
+import serializer
 import todoList
+from botocore.exceptions import ClientError
 
+logger = jsonlogger.get_logger()
 
+
+def _if_match(event):
+    # Expected version from the If-Match header ("3", "3-es", W/"3" or 3)
+    value = apigateway.header(event, 'If-Match')
+    if value is None or value.strip() == '*':
+        return None
+    value = value.strip()
+    if value.startswith('W/'):
+        value = value[2:]
+    try:
+        return int(value.strip('"').split('-', 1)[0])
+    except ValueError:
+        raise ValueError('If-Match must be the version of the todo')
+
+
+def _etag_headers(item):
+    # Items created before versioning have no ETag
+    tag = apigateway.item_etag(item)
+    return {"ETag": tag} if tag else {}
+
+
+@coldstart.profile
+@jsonlogger.correlated
+@awsclients.deadline
 def update(event, context):
-    data = json.loads(event['body'])
+    data = apigateway.request_json(event)
     if 'text' not in data or 'checked' not in data:
-        logging.error("Validation Failed")
+        logger.error("Validation Failed")
         raise Exception("Couldn't update the todo item.")
         return
     # update the todo in the database
-    result = todoList.update_item(
-        event['pathParameters']['id'],
-        data['text'], data['checked'])
+    try:
+        result = todoList.update_item(
+            event['pathParameters']['id'],
+            data['text'], data['checked'], version=_if_match(event))
+    except ValueError as e:
+        return {
+            "statusCode": 400,
+            "body": json.dumps({"message": str(e)})
+        }
+    except todoList.VersionConflict as e:
+        # the client can retry with the current version
+        return {
+            "statusCode": 409,
+            "headers": _etag_headers(e.item),
+            "body": serializer.dumps({"message": str(e), "item": e.item})
+        }
+    except ClientError as e:
+        # a failed write is not a missing todo
+        code = e.response['Error']['Code']
+        return {
+            "statusCode": 503 if code in awsclients.THROTTLE_CODES else 500,
+            "body": json.dumps({"message": "Couldn't update the todo item."})
+        }
+    if result is None:
+        return {
+            "statusCode": 404,
+            "body": ""
+        }
     # create a response
     response = {
         "statusCode": 200,
-        "body": json.dumps(result,
-                           cls=decimalencoder.DecimalEncoder)
+        "headers": _etag_headers(result),
+        "body": serializer.dumps(result)
     }
 
     return response
@@ -0,0 +1,52 @@
+import os
+import uuid
+import queue
+import awsclients
+import serializer
+
+# Write-behind queue of the async create mode (ASYNC_CREATE=true). Items
+# go to the SQS queue in CREATE_QUEUE_URL, or to an in-memory queue when
+# it is not set (tests and local runs). Both hand out SQS shaped records,
+# so the consumer treats them the same way.
+MAX_RECEIVE = 25
+
+_local = queue.Queue()
+
+
+def enabled():
+    return os.environ.get('ASYNC_CREATE', '').lower() in ('1', 'true')
+
+
+def _queue_url():
+    return os.environ.get('CREATE_QUEUE_URL') or None
+
+
+def send(item):
+    body = serializer.dumps(item)
+    url = _queue_url()
+    if url is None:
+        _local.put({'messageId': str(uuid.uuid4()), 'body': body})
+        return
+    awsclients.get_client('sqs').send_message(QueueUrl=url, MessageBody=body)
+
+
+def receive(max_records=MAX_RECEIVE):
+    # Records waiting in the local queue, the SQS ones arrive in the event
+    records = []
+    while len(records) < max_records:
+        try:
+            records.append(_local.get_nowait())
+        except queue.Empty:
+            break
+    return records
+
+
+def requeue(records):
+    # Failed local records go back, SQS does the same on its own
+    for record in records:
+        _local.put(record)
+
+
+def pending():
+    # For unit testing
+    return _local.qsize()
@@ -0,0 +1,186 @@
+# Benchmark de los handlers CRUD en proceso contra moto.
+#
+# Mide latencia (p50/p95/p99), throughput y memoria pico de cada handler
+# para distintos tamanos de tabla, y guarda o compara baselines en JSON:
+#
+#   python test/benchmark/handlers_bench.py --sizes 10,1000 --save base.json
+#   python test/benchmark/handlers_bench.py --sizes 10,1000 --compare base.json
+#
+# moto no simula Comprehend ni Translate, por eso translate se mide con la
+# traduccion ya cacheada (lectura del item + cache).
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import importlib
+import tracemalloc
+
+os.environ.setdefault('DYNAMODB_TABLE', 'todoBenchmarkTable')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             '..', '..', 'src'))
+
+import boto3
+from moto import mock_dynamodb2
+
+# translate va antes que update, que invalida las traducciones cacheadas
+HANDLERS = ('create', 'get', 'list', 'translate', 'update', 'delete')
+TEXT = "Aprender DevOps y Cloud en la UNIR"
+LANGUAGE = "it"
+MEMORY_CALLS = 5
+SEED_CHUNK = 1000
+
+
+def handler(name):
+    # Cada handler vive en el modulo de su mismo nombre (create.create...)
+    return getattr(importlib.import_module(name), name)
+
+
+def percentile(timings, rank):
+    ordered = sorted(timings)
+    index = max(0, int(round(rank / 100.0 * len(ordered))) - 1)
+    return ordered[index]
+
+
+def seed(size):
+    import todoList
+    ids = []
+    for start in range(0, size, SEED_CHUNK):
+        count = min(SEED_CHUNK, size - start)
+        ids.extend(r['id'] for r in todoList.put_items([TEXT] * count))
+    return ids
+
+
+def events(name, ids, created):
+    # Evento de API Gateway para la llamada numero i del handler
+    def event(i):
+        if name == 'create':
+            return {'body': json.dumps({'text': TEXT})}
+        if name == 'list':
+            return {'queryStringParameters': None}
+        if name == 'update':
+            return {'pathParameters': {'id': ids[i % len(ids)]},
+                    'body': json.dumps({'text': TEXT, 'checked': True})}
+        if name == 'translate':
+            return {'pathParameters': {'id': ids[i % len(ids)],
+                                       'language': LANGUAGE}}
+        if name == 'delete':
+            return {'pathParameters': {'id': created[i % len(created)]}}
+        return {'pathParameters': {'id': ids[i % len(ids)]}}
+    return event
+
+
+def warm_translations(ids):
+    import todoList
+    import translationcache
+    for key in ids:
+        item = todoList.get_item(key)
+        translationcache.put(item, LANGUAGE, TEXT)
+
+
+def measure(name, event, iterations):
+    function = handler(name)
+    timings = []
+    responses = []
+    start = time.perf_counter()
+    for i in range(iterations):
+        call = time.perf_counter()
+        responses.append(function(event(i), None))
+        timings.append((time.perf_counter() - call) * 1000)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    for i in range(MEMORY_CALLS):
+        function(event(i), None)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return responses, {
+        'calls': iterations,
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'throughput_rps': round(iterations / elapsed, 1),
+        'peak_memory_kb': round(peak / 1024.0, 1),
+    }
+
+
+def bench_size(size, iterations):
+    import awsclients
+    import todoList
+    with mock_dynamodb2():
+        awsclients.reset()
+        todoList.create_todo_table(
+            boto3.resource('dynamodb', region_name='us-east-1'))
+        ids = seed(size)
+        warm_translations(ids[:iterations])
+        results = {}
+        created = []
+        for name in HANDLERS:
+            # Un listado completo cuesta lo que la tabla, se llama menos
+            calls = (min(iterations, max(5, 10000 // size))
+                     if name == 'list' else iterations)
+            responses, results[name] = measure(
+                name, events(name, ids, created), calls)
+            if name == 'create':
+                # create devuelve la respuesta de put_item dentro del body
+                created.extend(json.loads(json.loads(r['body'])['body'])['id']
+                               for r in responses)
+        awsclients.reset()
+    return results
+
+
+def compare(current, baseline, threshold):
+    # Devuelve las regresiones de p95 por encima del umbral
+    regressions = []
+    for size, handlers in current['results'].items():
+        for name, result in handlers.items():
+            before = baseline['results'].get(size, {}).get(name)
+            if before and result['p95_ms'] > before['p95_ms'] * (
+                    1 + threshold):
+                regressions.append('%s @ %s items: p95 %.3f ms -> %.3f ms'
+                                   % (name, size, before['p95_ms'],
+                                      result['p95_ms']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='10,1000',
+                        help='tamanos de tabla, por ejemplo 10,1000,100000')
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--label', default='')
+    parser.add_argument('--save', help='guarda el resultado como baseline')
+    parser.add_argument('--compare', help='baseline con la que comparar')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='regresion tolerada de p95 (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    report = {
+        'meta': {
+            'label': args.label,
+            'python': platform.python_version(),
+            'timestamp': int(time.time()),
+            'iterations': args.iterations,
+        },
+        'results': {},
+    }
+    for size in [int(s) for s in args.sizes.split(',')]:
+        report['results'][str(size)] = bench_size(size, args.iterations)
+    print(json.dumps(report, indent=2))
+
+    if args.save:
+        with open(args.save, 'w') as baseline:
+            json.dump(report, baseline, indent=2)
+    if args.compare:
+        with open(args.compare) as baseline:
+            regressions = compare(report, json.load(baseline),
+                                  args.threshold)
+        for regression in regressions:
+            print('REGRESSION ' + regression)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
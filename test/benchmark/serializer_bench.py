@@ -0,0 +1,52 @@
+# Microbenchmark: serializer.dumps frente a decimalencoder.DecimalEncoder
+# Uso: python test/benchmark/serializer_bench.py [items] [repeticiones]
+import os
+import sys
+import json
+import time
+import decimal
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             '..', '..', 'src'))
+import decimalencoder
+import serializer
+
+
+def make_items(count):
+    # Items con la forma que devuelve DynamoDB (numeros como Decimal)
+    return [{
+        'id': 'item-%d' % i,
+        'text': 'Aprender DevOps y Cloud en la UNIR %d' % i,
+        'checked': i % 2 == 0,
+        'createdAt': decimal.Decimal(1609459200000 + i),
+        'updatedAt': decimal.Decimal(1609459200000 + i),
+        'version': decimal.Decimal(i % 7),
+    } for i in range(count)]
+
+
+def best_of(function, items, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(items)
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def main(count=10000, repeat=20):
+    items = make_items(count)
+    baseline = best_of(
+        lambda data: json.dumps(data, cls=decimalencoder.DecimalEncoder),
+        items, repeat)
+    current = best_of(serializer.dumps, items, repeat)
+    print(json.dumps({
+        'items': count,
+        'backend': 'orjson' if serializer.orjson else 'json',
+        'decimalencoder_ms': round(baseline, 2),
+        'serializer_ms': round(current, 2),
+        'speedup': round(baseline / current, 2),
+    }))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
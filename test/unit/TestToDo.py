@@ -7,6 +7,13 @@ import sys
 import os
 import json
 
+# Las lambdas importan sus modulos desde src/ (CodeUri: src/)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             '..', '..', 'src'))
+import awsclients
+import translationcache
+import itemcache
+
 @mock_dynamodb2
 class TestDatabaseFunctions(unittest.TestCase):
     def setUp(self):
@@ -38,6 +45,9 @@ class TestDatabaseFunctions(unittest.TestCase):
         self.dest_lang = "it"
         self.traduccion = "Scopri DevOps e Cloud presso UNIR"
 
+        awsclients.reset()
+        translationcache.clear()
+        itemcache.configure(None)
         from src.todoList import create_todo_table
         self.table = create_todo_table(self.dynamodb)
         #self.table_local = create_todo_table()
@@ -51,6 +61,7 @@ class TestDatabaseFunctions(unittest.TestCase):
         print ('Table deleted succesfully')
         #self.table_local.delete()
         self.dynamodb = None
+        awsclients.reset()
         print ('End: tearDown')
 
     def test_table_exists(self):
@@ -128,6 +139,159 @@ class TestDatabaseFunctions(unittest.TestCase):
         self.assertTrue(result[0]['text'] == self.text)
         print ('End: test_list_todo')
 
+    def test_list_todo_paginated(self):
+        print ('---------------------')
+        print ('Start: test_list_todo_paginated')
+        from src.todoList import put_item
+        from src.todoList import get_page
+        from src.todoList import iter_items
+
+        # Testing file functions
+        # Table mock
+        for i in range(3):
+            put_item(self.text + str(i), self.dynamodb)
+        self.assertEqual(3, len(list(iter_items(self.dynamodb, 1))))
+        items, cursor = get_page(2, None, self.dynamodb)
+        self.assertEqual(2, len(items))
+        self.assertIsNotNone(cursor)
+        rest, cursor = get_page(2, cursor, self.dynamodb)
+        self.assertEqual(1, len(rest))
+        self.assertIsNone(cursor)
+        self.assertRaises(ValueError, get_page, 2, "no-cursor", self.dynamodb)
+        from src.todoList import encode_cursor
+        for key in ({'id': 1}, {'id': 'x', 'text': 'y'}, ['id']):
+            self.assertRaises(ValueError, get_page, 2, encode_cursor(key),
+                              self.dynamodb)
+        print ('End: test_list_todo_paginated')
+
+    def test_list_handler_cursor(self):
+        print ('---------------------')
+        print ('Start: test_list_handler_cursor')
+        from src.todoList import put_item
+        from src.list import list as list_todos
+        put_item(self.text, self.dynamodb)
+        put_item(self.text, self.dynamodb)
+        response = list_todos({'queryStringParameters': {'limit': '1'}}, None)
+        self.assertEqual(200, response['statusCode'])
+        body = json.loads(response['body'])
+        self.assertEqual(1, len(body['items']))
+        response = list_todos({'queryStringParameters': {
+            'limit': '1', 'cursor': body['cursor']}}, None)
+        self.assertEqual(1, len(json.loads(response['body'])['items']))
+        response = list_todos({'queryStringParameters': {'limit': '0'}}, None)
+        self.assertEqual(400, response['statusCode'])
+        response = list_todos({'queryStringParameters': None}, None)
+        self.assertEqual(2, len(json.loads(response['body'])))
+        print ('End: test_list_handler_cursor')
+
+    def test_get_items_by_ids(self):
+        print ('---------------------')
+        print ('Start: test_get_items_by_ids')
+        from src.todoList import put_items
+        from src.todoList import get_items_by_ids
+        from src.list import list as list_todos
+        ids = [r['id'] for r in put_items(
+            [self.text + str(i) for i in range(120)], self.dynamodb)]
+        wanted = list(reversed(ids)) + [ids[0], self.uuid]
+        items = get_items_by_ids(wanted, self.dynamodb)
+        # Mantiene el orden pedido, sin duplicados ni ids inexistentes
+        self.assertEqual(list(reversed(ids)), [i['id'] for i in items])
+        response = list_todos({'queryStringParameters': {
+            'ids': ','.join(ids[:3])}}, None)
+        self.assertEqual(ids[:3],
+                         [i['id'] for i in json.loads(response['body'])])
+        response = list_todos({'queryStringParameters': {
+            'ids': ','.join(ids[:101])}}, None)
+        self.assertEqual(400, response['statusCode'])
+
+        # Sin tiempo para leer todas las claves se responde 503
+        class Context:
+            def get_remaining_time_in_millis(self):
+                return 100
+
+        response = list_todos({'queryStringParameters': {
+            'ids': ','.join(ids[:3])}}, Context())
+        self.assertEqual(503, response['statusCode'])
+        print ('End: test_get_items_by_ids')
+
+    def test_router(self):
+        print ('---------------------')
+        print ('Start: test_router')
+        from src.todoList import put_item
+        from src.router import handle
+        responsePut = put_item(self.text, self.dynamodb)
+        idItem = json.loads(responsePut['body'])['id']
+        response = handle({'httpMethod': 'GET', 'resource': '/todos',
+                           'queryStringParameters': None}, None)
+        self.assertEqual(200, response['statusCode'])
+        self.assertEqual(1, len(json.loads(response['body'])))
+        response = handle({'httpMethod': 'GET', 'resource': '/todos/{id}',
+                           'pathParameters': {'id': idItem}}, None)
+        self.assertEqual(self.text, json.loads(response['body'])['text'])
+        response = handle({'httpMethod': 'PATCH', 'resource': '/todos'},
+                          None)
+        self.assertEqual(404, response['statusCode'])
+        print ('End: test_router')
+
+    def test_scan_all(self):
+        print ('---------------------')
+        print ('Start: test_scan_all')
+        from src.todoList import put_item
+        from src.todoList import scan_all
+        ids = set()
+        for i in range(5):
+            responsePut = put_item(self.text + str(i), self.dynamodb)
+            ids.add(json.loads(responsePut['body'])['id'])
+        items = list(scan_all(3, 2, None, self.dynamodb))
+        self.assertEqual(ids, set(item['id'] for item in items))
+        items = list(scan_all(1, fields=['id', 'checked'],
+                              dynamodb=self.dynamodb))
+        self.assertEqual(5, len(items))
+        self.assertNotIn('text', items[0])
+        # Cerrar el generador antes de tiempo detiene los segmentos
+        items = scan_all(2, dynamodb=self.dynamodb)
+        next(items)
+        items.close()
+        print ('End: test_scan_all')
+
+    def test_export_pages(self):
+        print ('---------------------')
+        print ('Start: test_export_pages')
+        from src.todoList import put_item
+        from src.todoList import encode_cursor
+        import src.export as export
+        ids = set()
+        for i in range(5):
+            responsePut = put_item(self.text + str(i), self.dynamodb)
+            ids.add(json.loads(responsePut['body'])['id'])
+        page_size = export.PAGE_SIZE
+        export.PAGE_SIZE = 2
+        try:
+            params = {'segments': '1'}
+            found = []
+            while True:
+                response = export.export(
+                    {'queryStringParameters': params}, None)
+                self.assertEqual(200, response['statusCode'])
+                body = json.loads(response['body'])
+                self.assertLessEqual(len(body['items']), 2)
+                found.extend(item['id'] for item in body['items'])
+                if body['cursor'] is None:
+                    break
+                params = {'cursor': body['cursor']}
+        finally:
+            export.PAGE_SIZE = page_size
+        self.assertEqual(sorted(ids), sorted(found))
+        for cursor in ('no-cursor', encode_cursor({'segments': 1}),
+                       encode_cursor({'segments': 1,
+                                      'pending': [[3, None]]}),
+                       encode_cursor({'segments': 1,
+                                      'pending': [[0, {'id': 1}]]})):
+            response = export.export(
+                {'queryStringParameters': {'cursor': cursor}}, None)
+            self.assertEqual(400, response['statusCode'])
+        print ('End: test_export_pages')
+
 
     def test_update_todo(self):
         print ('---------------------')
@@ -208,6 +372,60 @@ class TestDatabaseFunctions(unittest.TestCase):
         self.assertRaises(TypeError, delete_item("", self.dynamodb))
         print ('End: test_delete_todo_error')
 
+    def test_batch_put_delete(self):
+        print ('---------------------')
+        print ('Start: test_batch_put_delete')
+        from src.todoList import put_items
+        from src.todoList import delete_items
+        from src.todoList import get_items
+        # Mas de un lote de 25 elementos
+        results = put_items([self.text] * 30, self.dynamodb)
+        self.assertEqual(30, len(results))
+        self.assertTrue(all(r['status'] == 'created' for r in results))
+        self.assertEqual(30, len(get_items(self.dynamodb)))
+        ids = [r['id'] for r in results]
+        results = delete_items(ids + ids[:2], self.dynamodb)
+        self.assertEqual(30, len(results))
+        self.assertTrue(all(r['status'] == 'deleted' for r in results))
+        self.assertEqual(0, len(get_items(self.dynamodb)))
+        print ('End: test_batch_put_delete')
+
+    def test_batch_write_unprocessed(self):
+        print ('---------------------')
+        print ('Start: test_batch_write_unprocessed')
+        import dynamobatch
+        request = {'DeleteRequest': {'Key': {'id': self.uuid}}}
+
+        class Client:
+            calls = 0
+
+            def batch_write_item(self, RequestItems):
+                Client.calls += 1
+                return {'UnprocessedItems': RequestItems}
+
+        delays = []
+        failed = dynamobatch.write(Client(), 'todos', [request],
+                                   delays.append)
+        # Reintenta con backoff y devuelve lo que no pudo escribir
+        self.assertEqual([request], failed)
+        self.assertEqual(dynamobatch.MAX_ATTEMPTS, Client.calls)
+        self.assertEqual(dynamobatch.MAX_ATTEMPTS - 1, len(delays))
+        self.assertTrue(all(0 <= d <= dynamobatch.MAX_DELAY for d in delays))
+        # Sin tiempo restante en la lambda no se reintenta y todo es fallido
+        import awsclients
+
+        class Context:
+            def get_remaining_time_in_millis(self):
+                return 100
+
+        Client.calls = 0
+        write = awsclients.deadline(lambda event, context: dynamobatch.write(
+            Client(), 'todos', [request] * 30, delays.append))
+        self.assertEqual([request] * 30, write({}, Context()))
+        self.assertEqual(0, Client.calls)
+        self.assertIsNone(awsclients.time_left())
+        print ('End: test_batch_write_unprocessed')
+
     def test_get_todo_error(self):
         #En este caso, busco un id no valido.
         print ('---------------------')
@@ -234,6 +452,718 @@ class TestDatabaseFunctions(unittest.TestCase):
         del os.environ['ENDPOINT_OVERRIDE']
         print ('End: test_get_table_none')
 
+    def test_get_table_cached(self):
+        print ('---------------------')
+        print ('Start: test_get_table_cached')
+        from src.todoList import get_table
+        table = get_table()
+        # La tabla se reutiliza entre invocaciones del mismo contenedor
+        self.assertIs(table, get_table())
+        awsclients.reset()
+        self.assertIsNot(table, get_table())
+        print ('End: test_get_table_cached')
+
+    def test_coldstart_profile(self):
+        print ('---------------------')
+        print ('Start: test_coldstart_profile')
+        import io
+        import contextlib
+        import coldstart
+        from src.todoList import get_table
+
+        def handler(event, context):
+            get_table()
+            return event
+
+        # Sin COLDSTART_PROFILE el handler no se modifica
+        self.assertIs(handler, coldstart.profile(handler))
+        os.environ['COLDSTART_PROFILE'] = 'true'
+        try:
+            profiled = coldstart.profile(handler)
+        finally:
+            del os.environ['COLDSTART_PROFILE']
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.assertEqual(1, profiled(1, None))
+            self.assertEqual(2, profiled(2, None))
+        # Solo se registra la primera invocacion
+        lines = output.getvalue().splitlines()
+        self.assertEqual(1, len(lines))
+        record = json.loads(lines[0])
+        self.assertTrue(record['handler'].endswith('handler'))
+        self.assertIn('first_call_ms', record)
+        self.assertIn('session:us-east-1', record['client_build_ms'])
+        # Los modulos importados por el router cuentan desde su import
+        imported_at = coldstart._imported_at
+        coldstart._imported_at = imported_at - 100
+        handler.__module__ = 'lazy_handler'
+        coldstart.mark_import('lazy_handler')
+        os.environ['COLDSTART_PROFILE'] = 'true'
+        try:
+            profiled = coldstart.profile(handler)
+        finally:
+            del os.environ['COLDSTART_PROFILE']
+            coldstart._imported_at = imported_at
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            profiled(1, None)
+        self.assertLess(json.loads(output.getvalue())['import_ms'], 100000)
+        print ('End: test_coldstart_profile')
+
+    def test_serializer(self):
+        print ('---------------------')
+        print ('Start: test_serializer')
+        import decimal
+        import serializer
+        body = serializer.dumps({
+            'entero': decimal.Decimal('1609459200000'),
+            'fraccion': decimal.Decimal('1.5'),
+            'conjunto': {decimal.Decimal('2'), decimal.Decimal('1')},
+            'texto': self.text})
+        # Los decimales con fraccion ya no se truncan
+        self.assertEqual({'entero': 1609459200000, 'fraccion': 1.5,
+                          'conjunto': [1, 2], 'texto': self.text},
+                         json.loads(body))
+        self.assertRaises(TypeError, serializer.dumps, object())
+        print ('End: test_serializer')
+
+    def test_jsonlogger(self):
+        print ('---------------------')
+        print ('Start: test_jsonlogger')
+        import io
+        import logging
+        import jsonlogger
+
+        class Context:
+            aws_request_id = 'request-1'
+
+        stream = io.StringIO()
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(jsonlogger.JsonFormatter())
+        handler.addFilter(jsonlogger.SamplingFilter())
+        logger = logging.getLogger('todo-test')
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+        jsonlogger.bind(Context())
+        logger.info('getItem %s', self.uuid,
+                    extra=jsonlogger.with_fields(found=True))
+        # Los eventos muestreados con tasa 0 no se escriben
+        logger.info('sampled', extra=jsonlogger.sampled(0))
+        logger.info('sampled', extra=jsonlogger.sampled(1))
+        jsonlogger.bind(None)
+        lines = [json.loads(l) for l in stream.getvalue().splitlines()]
+        self.assertEqual(2, len(lines))
+        self.assertEqual('getItem ' + self.uuid, lines[0]['message'])
+        self.assertEqual('request-1', lines[0]['requestId'])
+        self.assertTrue(lines[0]['found'])
+        self.assertEqual('INFO', lines[1]['level'])
+        print ('End: test_jsonlogger')
+
+    def test_metrics_emf(self):
+        print ('---------------------')
+        print ('Start: test_metrics_emf')
+        import io
+        import contextlib
+        from src.todoList import put_item
+        from src.todoList import get_item
+        from src.todoList import get_items
+        os.environ['METRICS_ENABLED'] = 'true'
+        os.environ['RETURN_CONSUMED_CAPACITY'] = 'true'
+        output = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(output):
+                responsePut = put_item(self.text, self.dynamodb)
+                get_item(json.loads(responsePut['body'])['id'],
+                         self.dynamodb)
+                get_items(self.dynamodb)
+        finally:
+            del os.environ['METRICS_ENABLED']
+            del os.environ['RETURN_CONSUMED_CAPACITY']
+        records = {}
+        for line in output.getvalue().splitlines():
+            if line.startswith('{"_aws"'):
+                record = json.loads(line)
+                records[record['Operation']] = record
+        self.assertEqual({'PutItem', 'GetItem', 'Scan'}, set(records))
+        for record in records.values():
+            self.assertGreaterEqual(record['Latency'], 0)
+            metric = record['_aws']['CloudWatchMetrics'][0]
+            self.assertEqual([['Operation']], metric['Dimensions'])
+        self.assertIn('ConsumedRCU', records['GetItem'])
+        # La paginacion tambien mide su Scan
+        from src.todoList import get_page
+        os.environ['METRICS_ENABLED'] = 'true'
+        output = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(output):
+                get_page(1, None, self.dynamodb)
+        finally:
+            del os.environ['METRICS_ENABLED']
+        self.assertEqual('Scan', json.loads(output.getvalue())['Operation'])
+        print ('End: test_metrics_emf')
+
+    def test_query_items(self):
+        print ('---------------------')
+        print ('Start: test_query_items')
+        from src.todoList import put_item
+        from src.todoList import get_item
+        from src.todoList import update_item
+        from src.todoList import query_items
+        from src.list import list as list_todos
+        ids = [json.loads(put_item(self.text + str(i), self.dynamodb,
+                                   owner=owner)['body'])['id']
+               for i, owner in enumerate(['ana', 'ana', 'luis', None])]
+        update_item(ids[0], self.text, "true", self.dynamodb)
+        mine = query_items(owner='ana', dynamodb=self.dynamodb)
+        self.assertEqual(set(ids[:2]), {item['id'] for item in mine})
+        done = query_items(checked=True, dynamodb=self.dynamodb)
+        self.assertEqual([ids[0]], [item['id'] for item in done])
+        pending = query_items(owner='ana', checked=False,
+                              dynamodb=self.dynamodb)
+        self.assertEqual([ids[1]], [item['id'] for item in pending])
+        # since filtra por fecha de creacion dentro del indice
+        since = get_item(ids[3], self.dynamodb)['createdAt']
+        recent = query_items(checked=False, since=since,
+                             dynamodb=self.dynamodb)
+        self.assertEqual([ids[3]], [item['id'] for item in recent])
+        self.assertRaises(ValueError, query_items, since=since,
+                          dynamodb=self.dynamodb)
+        response = list_todos({'queryStringParameters': {
+            'owner': 'luis'}}, None)
+        self.assertEqual(200, response['statusCode'])
+        self.assertEqual([ids[2]],
+                         [item['id'] for item in json.loads(response['body'])])
+        response = list_todos({'queryStringParameters': {
+            'checked': 'maybe'}}, None)
+        self.assertEqual(400, response['statusCode'])
+        # Sin los indices (TodosIndexes=none) el listado responde 503
+        table = os.environ['DYNAMODB_TABLE']
+        os.environ['DYNAMODB_TABLE'] = 'todoWithoutIndexesTable'
+        try:
+            self.dynamodb.create_table(
+                TableName=os.environ['DYNAMODB_TABLE'],
+                KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
+                AttributeDefinitions=[
+                    {'AttributeName': 'id', 'AttributeType': 'S'}],
+                ProvisionedThroughput={'ReadCapacityUnits': 1,
+                                       'WriteCapacityUnits': 1})
+            for params in ({'owner': 'luis'}, {'since': '0'}):
+                response = list_todos({'queryStringParameters': params},
+                                      None)
+                self.assertEqual(503, response['statusCode'])
+        finally:
+            os.environ['DYNAMODB_TABLE'] = table
+        print ('End: test_query_items')
+
+    def test_backfill_items(self):
+        print ('---------------------')
+        print ('Start: test_backfill_items')
+        import migrations
+        from src.migrate import migrate
+        from src.todoList import get_table
+        from src.todoList import get_item
+        from src.todoList import query_items
+        # Items anteriores a los indices: sin status ni owner
+        table = get_table(self.dynamodb)
+        for i, checked in enumerate([True, False, False]):
+            table.put_item(Item={'id': 'legacy%d' % i, 'text': self.text,
+                                 'checked': checked,
+                                 'createdAt': '1610000000.25%d' % i,
+                                 'updatedAt': '1610000000.25%d' % i})
+        self.assertEqual([], query_items(checked=True, dynamodb=self.dynamodb))
+        page_size = migrations.PAGE_SIZE
+        migrations.PAGE_SIZE = 2
+        try:
+            result = migrations.backfill_items(
+                owners={'legacy1': 'ana'}, dynamodb=self.dynamodb)
+        finally:
+            migrations.PAGE_SIZE = page_size
+        self.assertEqual({'scanned': 3, 'updated': 3, 'cursor': None},
+                         result)
+        self.assertEqual(['legacy0'], [item['id'] for item in query_items(
+            checked=True, dynamodb=self.dynamodb)])
+        self.assertEqual(['legacy1'], [item['id'] for item in query_items(
+            owner='ana', dynamodb=self.dynamodb)])
+        item = get_item('legacy2', self.dynamodb)
+        self.assertEqual('open', item['status'])
+        # Las fechas pasan de segundos en texto a milisegundos enteros
+        self.assertEqual(1610000000252, item['createdAt'])
+        self.assertEqual(1610000000252, item['updatedAt'])
+        # Volver a ejecutarla no cambia nada
+        self.assertEqual(0, migrate({}, None)['updated'])
+        print ('End: test_backfill_items')
+
+    def test_recent_items(self):
+        print ('---------------------')
+        print ('Start: test_recent_items')
+        import sortableid
+        from src.todoList import put_items
+        from src.todoList import update_item
+        from src.todoList import recent_items
+        from src.list import list as list_todos
+        # Los ids creados en el mismo milisegundo siguen siendo crecientes
+        now = sortableid.now_ms()
+        keys = [sortableid.new(now) for i in range(3)]
+        self.assertEqual(sorted(set(keys)), keys)
+        self.assertEqual(26, len(keys[0]))
+        self.assertGreaterEqual(sortableid.timestamp(keys[0]), now)
+        ids = [r['id'] for r in put_items(
+            [self.text + str(i) for i in range(5)], self.dynamodb)]
+        self.assertEqual(sorted(ids), ids)
+        update_item(ids[1], self.text, "true", self.dynamodb)
+        items = recent_items(dynamodb=self.dynamodb)
+        self.assertEqual(list(reversed(ids)), [item['id'] for item in items])
+        self.assertEqual(sortableid.timestamp(items[0]['id']),
+                         items[0]['createdAt'])
+        self.assertEqual(ids[:1:-1], [item['id'] for item in recent_items(
+            limit=3, dynamodb=self.dynamodb)])
+        since = items[0]['createdAt'] + 1
+        self.assertEqual([], recent_items(since=since,
+                                          dynamodb=self.dynamodb))
+        # Con since se devuelven los mas antiguos primero, sin saltos
+        since = items[-1]['createdAt']
+        self.assertEqual(ids[:2], [item['id'] for item in recent_items(
+            since=since, limit=2, dynamodb=self.dynamodb)])
+        response = list_todos({'queryStringParameters': {
+            'since': str(since), 'order': 'newest', 'limit': '2'}}, None)
+        self.assertEqual(400, response['statusCode'])
+        response = list_todos({'queryStringParameters': {
+            'order': 'newest', 'limit': '2'}}, None)
+        self.assertEqual(ids[:2:-1], [item['id'] for item in
+                                      json.loads(response['body'])])
+        response = list_todos({'queryStringParameters': {
+            'since': 'yesterday'}}, None)
+        self.assertEqual(400, response['statusCode'])
+        print ('End: test_recent_items')
+
+    def test_changes_since(self):
+        print ('---------------------')
+        print ('Start: test_changes_since')
+        import time
+        import changefeed
+        from src.changes import changes
+        from src.changes import consume
+        os.environ['CHANGES_TABLE'] = 'changesUnitTestsTable'
+        try:
+            table = changefeed.create_changes_table(self.dynamodb)
+            # Cambios anteriores a la marca de agua
+            now = time.time() - 120
+            # Registros con el formato del stream de DynamoDB
+            records = [{
+                'eventName': name,
+                'dynamodb': {
+                    'ApproximateCreationDateTime': now + i,
+                    'Keys': {'id': {'S': key}},
+                    'NewImage': {'id': {'S': key},
+                                 'updatedAt': {'N': str(1000 + i)}},
+                    'SequenceNumber': str(100 + i),
+                }
+            } for i, (name, key) in enumerate([('INSERT', 'a'),
+                                               ('MODIFY', 'a'),
+                                               ('INSERT', 'b')])]
+            records.append({'eventName': 'REMOVE', 'dynamodb': {
+                'ApproximateCreationDateTime': now + 3,
+                'Keys': {'id': {'S': 'b'}},
+                'SequenceNumber': '103'}})
+            # Un registro ilegible no bloquea el lote
+            records.append({'eventName': 'UNKNOWN', 'dynamodb': {}})
+            # Uno reciente aun no se sirve
+            records.append({'eventName': 'INSERT', 'dynamodb': {
+                'ApproximateCreationDateTime': time.time(),
+                'Keys': {'id': {'S': 'c'}},
+                'SequenceNumber': '104'}})
+            self.assertEqual({'recorded': 5},
+                             consume({'Records': records}, None))
+            # Reintentar el lote no duplica los cambios
+            consume({'Records': records}, None)
+            since = str(int(now * 1000))
+            found, cursor = changefeed.changes_since(since, limit=3)
+            self.assertEqual([('a', 'create', 1000), ('a', 'update', 1001),
+                              ('b', 'create', 1002)],
+                             [(c['id'], c['op'], c['version'])
+                              for c in found])
+            response = changes({'queryStringParameters': {
+                'cursor': cursor}}, None)
+            body = json.loads(response['body'])
+            self.assertEqual(200, response['statusCode'])
+            self.assertEqual([('b', 'delete', None)],
+                             [(c['id'], c['op'], c['version'])
+                              for c in body['changes']])
+            response = changes({'queryStringParameters': {
+                'cursor': body['cursor']}}, None)
+            body = json.loads(response['body'])
+            self.assertEqual([], body['changes'])
+            watermark = changefeed.WATERMARK_MS
+            changefeed.WATERMARK_MS = 0
+            try:
+                found, _ = changefeed.changes_since(cursor=body['cursor'])
+            finally:
+                changefeed.WATERMARK_MS = watermark
+            self.assertEqual(['c'], [c['id'] for c in found])
+            # Un cursor sin cambios avanza hasta la marca de agua y sigue
+            # siendo valido pasada la retencion
+            cursor = body['cursor']
+            clock = time.time
+            seen = []
+            try:
+                for day in range(1, changefeed.RETENTION_DAYS + 2):
+                    time.time = lambda: clock() + day * 24 * 3600
+                    found, cursor = changefeed.changes_since(cursor=cursor)
+                    seen.extend(c['id'] for c in found)
+            finally:
+                time.time = clock
+            self.assertEqual(['c'], seen)
+            response = changes({'queryStringParameters': None}, None)
+            self.assertEqual(400, response['statusCode'])
+            response = changes({'queryStringParameters': {'since': '0'}},
+                               None)
+            self.assertEqual(410, response['statusCode'])
+            table.delete()
+        finally:
+            del os.environ['CHANGES_TABLE']
+        print ('End: test_changes_since')
+
+    def test_item_cache(self):
+        print ('---------------------')
+        print ('Start: test_item_cache')
+        import lrucache
+        from src.todoList import put_item
+        from src.todoList import get_item
+        from src.todoList import update_item
+        from src.todoList import delete_item
+        # LRU con TTL y contadores, con un reloj controlado
+        now = [0]
+        cache = lrucache.LRUCache(2, ttl=10, clock=lambda: now[0])
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.set('c', 3)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(2, cache.get('b'))
+        now[0] = 10
+        self.assertIsNone(cache.get('c'))
+        self.assertEqual({'size': 1, 'hits': 1, 'misses': 2,
+                          'evictions': 1, 'expirations': 1}, cache.stats())
+        backend = itemcache.LocalBackend()
+        itemcache.configure(60, backend)
+        idItem = json.loads(put_item(self.text, self.dynamodb)['body'])['id']
+        self.assertEqual(self.text, get_item(idItem, self.dynamodb)['text'])
+        # El segundo get no llega a DynamoDB
+        self.table.delete_item(Key={'id': idItem})
+        self.assertEqual(self.text, get_item(idItem, self.dynamodb)['text'])
+        self.assertEqual(1, itemcache.stats()['hits'])
+        # Otro contenedor (LRU vacio) lee del backend compartido
+        itemcache.clear()
+        self.assertEqual(self.text, get_item(idItem, self.dynamodb)['text'])
+        self.assertEqual(1, itemcache.stats()['backendHits'])
+        # update y delete invalidan las entradas
+        idItem = json.loads(put_item(self.text, self.dynamodb)['body'])['id']
+        get_item(idItem, self.dynamodb)
+        update_item(idItem, "Nuevo texto", "false", self.dynamodb)
+        self.assertEqual("Nuevo texto",
+                         get_item(idItem, self.dynamodb)['text'])
+        delete_item(idItem, self.dynamodb)
+        self.assertIsNone(get_item(idItem, self.dynamodb))
+        itemcache.configure(None)
+        print ('End: test_item_cache')
+
+    def test_update_version(self):
+        print ('---------------------')
+        print ('Start: test_update_version')
+        from src.todoList import put_item
+        from src.todoList import get_item
+        from src.todoList import update_item
+        from src.todoList import VersionConflict
+        from src.update import update
+        idItem = json.loads(put_item(self.text, self.dynamodb)['body'])['id']
+        self.assertEqual(1, get_item(idItem, self.dynamodb)['version'])
+        result = update_item(idItem, self.text, "true", self.dynamodb,
+                             version=1)
+        self.assertEqual(2, result['version'])
+        # Una version antigua es un conflicto, no una sobrescritura
+        with self.assertRaises(VersionConflict) as conflict:
+            update_item(idItem, "Otro texto", "false", self.dynamodb,
+                        version=1)
+        self.assertEqual(2, conflict.exception.item['version'])
+        # Actualizar un id inexistente no crea el item
+        self.assertIsNone(update_item(self.uuid, self.text, "false",
+                                      self.dynamodb, version=1))
+        self.assertIsNone(get_item(self.uuid, self.dynamodb))
+        body = json.dumps({'text': self.text, 'checked': False})
+        response = update({'pathParameters': {'id': idItem}, 'body': body,
+                           'headers': {'If-Match': '"2"'}}, None)
+        self.assertEqual(200, response['statusCode'])
+        self.assertEqual('"3"', response['headers']['ETag'])
+        response = update({'pathParameters': {'id': idItem}, 'body': body,
+                           'headers': {'if-match': 'W/"2"'}}, None)
+        self.assertEqual(409, response['statusCode'])
+        self.assertEqual('"3"', response['headers']['ETag'])
+        response = update({'pathParameters': {'id': self.uuid},
+                           'body': body, 'headers': None}, None)
+        self.assertEqual(404, response['statusCode'])
+        response = update({'pathParameters': {'id': idItem}, 'body': body,
+                           'headers': {'If-Match': 'latest'}}, None)
+        self.assertEqual(400, response['statusCode'])
+        # Los items anteriores al versionado estan en la version 0
+        from src.todoList import get_table
+        get_table(self.dynamodb).put_item(Item={
+            'id': 'legacy', 'text': self.text, 'checked': False,
+            'createdAt': 1000, 'updatedAt': 1000})
+        response = update({'pathParameters': {'id': 'legacy'}, 'body': body,
+                           'headers': {'If-Match': '"5"'}}, None)
+        self.assertEqual(409, response['statusCode'])
+        self.assertNotIn('ETag', response['headers'])
+        self.assertEqual(1, update_item('legacy', self.text, "true",
+                                        self.dynamodb, version=0)['version'])
+        # Un error de DynamoDB no es un 404
+        import todoList
+        from botocore.exceptions import ClientError
+
+        def throttled(*args, **kwargs):
+            raise ClientError({'Error': {
+                'Code': 'ProvisionedThroughputExceededException',
+                'Message': 'throttled'}}, 'UpdateItem')
+
+        original = todoList.update_item
+        todoList.update_item = throttled
+        try:
+            response = update({'pathParameters': {'id': idItem},
+                               'body': body, 'headers': None}, None)
+        finally:
+            todoList.update_item = original
+        self.assertEqual(503, response['statusCode'])
+        print ('End: test_update_version')
+
+    def test_client_config(self):
+        print ('---------------------')
+        print ('Start: test_client_config')
+        import io
+        import contextlib
+        from src.todoList import get_table
+        config = awsclients.config(2.0)
+        self.assertEqual('adaptive', config.retries['mode'])
+        self.assertEqual(2.0, config.read_timeout)
+        self.assertEqual(1.0, config.connect_timeout)
+        self.assertEqual(awsclients.POOL_SIZE, config.max_pool_connections)
+        # Timeout segun el tiempo restante de la lambda, en pasos de 0.5 s
+        self.assertEqual(2.5, awsclients._timeout(2900))
+        self.assertEqual(awsclients.MIN_TIMEOUT, awsclients._timeout(100))
+        self.assertEqual(awsclients.READ_TIMEOUT, awsclients._timeout(60000))
+
+        class Context(object):
+            def get_remaining_time_in_millis(self):
+                return 1800
+
+        handler = awsclients.deadline(lambda event, context: (
+            get_table().meta.client.meta.config.read_timeout))
+        self.assertEqual(1.5, handler({}, Context()))
+        self.assertEqual(awsclients.READ_TIMEOUT, handler({}, None))
+        # Contador de throttles, emitido como metrica al final
+        client = get_table().meta.client
+        operation = client.meta.service_model.operation_model('GetItem')
+        error = {'Error': {
+            'Code': 'ProvisionedThroughputExceededException'}}
+        awsclients._count_throttle((None, error), operation)
+        awsclients._count_throttle((None, {}), operation)
+        self.assertEqual({'dynamodb:GetItem': 1}, awsclients.throttles)
+        os.environ['METRICS_ENABLED'] = 'true'
+        output = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(output):
+                awsclients.flush_throttles()
+        finally:
+            del os.environ['METRICS_ENABLED']
+        record = json.loads(output.getvalue())
+        self.assertEqual(1, record['Throttles'])
+        self.assertEqual('GetItem', record['Operation'])
+        self.assertEqual({}, awsclients.flush_throttles())
+        print ('End: test_client_config')
+
+    def test_single_flight(self):
+        print ('---------------------')
+        print ('Start: test_single_flight')
+        import time
+        import threading
+        import singleflight
+        from concurrent.futures import ThreadPoolExecutor
+        from src.todoList import put_item
+        from src.todoList import get_item
+        from src.todoList import coalescing_stats
+        group = singleflight.Group()
+        release = threading.Event()
+        calls = []
+
+        def read(key):
+            calls.append(key)
+            release.wait(5)
+            return {'id': key, 'tags': ['a']}
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            futures = [pool.submit(group.do, 'k', read, 'k')
+                       for i in range(4)]
+            # Se espera a que las otras tres llamadas esten esperando
+            while group.stats()['collapsed'] < 3:
+                time.sleep(0.01)
+            release.set()
+            results = [future.result() for future in futures]
+        self.assertEqual(['k'], calls)
+        self.assertEqual({'executed': 1, 'collapsed': 3, 'inFlight': 0},
+                         group.stats())
+        # Cada llamada recibe su propia copia del resultado
+        results[0]['tags'].append('b')
+        self.assertEqual(['a'], results[1]['tags'])
+        # Las excepciones tambien se comparten
+        self.assertRaises(KeyError, group.do, 'e', {}.__getitem__, 'x')
+        self.assertEqual(0, group.stats()['inFlight'])
+        idItem = json.loads(put_item(self.text, self.dynamodb)['body'])['id']
+        executed = coalescing_stats()['executed']
+        self.assertEqual(self.text, get_item(idItem, self.dynamodb)['text'])
+        self.assertEqual(executed + 1, coalescing_stats()['executed'])
+        print ('End: test_single_flight')
+
+    def test_async_create(self):
+        print ('---------------------')
+        print ('Start: test_async_create')
+        import writequeue
+        from src.todoList import get_item
+        from src.create import create
+        from src.create import flush
+        os.environ['ASYNC_CREATE'] = 'true'
+        try:
+            response = create({'body': json.dumps({'text': self.text})},
+                              None)
+        finally:
+            del os.environ['ASYNC_CREATE']
+        self.assertEqual(202, response['statusCode'])
+        idItem = json.loads(response['body'])['id']
+        # El item se guarda al vaciar la cola, no al crearlo
+        self.assertIsNone(get_item(idItem, self.dynamodb))
+        self.assertEqual(1, writequeue.pending())
+        self.assertEqual({'batchItemFailures': []}, flush({}, None))
+        self.assertEqual(0, writequeue.pending())
+        self.assertEqual(self.text, get_item(idItem, self.dynamodb)['text'])
+        # Evento de SQS con un mensaje repetido
+        body = json.dumps({'id': self.uuid, 'text': self.text,
+                           'checked': False, 'version': 1})
+        records = [{'messageId': 'm1', 'body': body},
+                   {'messageId': 'm2', 'body': body}]
+        self.assertEqual({'batchItemFailures': []},
+                         flush({'Records': records}, None))
+        self.assertEqual(self.text,
+                         get_item(self.uuid, self.dynamodb)['text'])
+        # Un mensaje reentregado no deshace las actualizaciones posteriores
+        from src.todoList import update_item
+        update_item(self.uuid, "Otro texto", "true", self.dynamodb)
+        records = [{'messageId': 'm1', 'body': body,
+                    'attributes': {'ApproximateReceiveCount': '2'}}]
+        self.assertEqual({'batchItemFailures': []},
+                         flush({'Records': records}, None))
+        item = get_item(self.uuid, self.dynamodb)
+        self.assertEqual(("Otro texto", 2), (item['text'], item['version']))
+        print ('End: test_async_create')
+
+    def test_list_fields(self):
+        print ('---------------------')
+        print ('Start: test_list_fields')
+        from src.todoList import put_items
+        from src.list import list as list_todos
+        from src.get import get
+        ids = [r['id'] for r in put_items([self.text] * 3, self.dynamodb)]
+        summary = {'id', 'checked'}
+
+        def fetch(params):
+            response = list_todos({'queryStringParameters': params}, None)
+            self.assertEqual(200, response['statusCode'])
+            return json.loads(response['body'])
+
+        for params in ({}, {'ids': ','.join(ids)}, {'order': 'newest'},
+                       {'checked': 'false'}):
+            params['fields'] = 'id,checked'
+            items = fetch(params)
+            self.assertEqual(set(ids), {item['id'] for item in items})
+            self.assertEqual([summary] * 3, [set(item) for item in items])
+        page = fetch({'limit': '2', 'fields': 'text'})
+        self.assertEqual([{'text'}] * 2, [set(i) for i in page['items']])
+        # El orden de newest se mantiene aunque no se pida createdAt
+        items = fetch({'order': 'newest', 'fields': 'checked,id'})
+        self.assertEqual(ids[::-1], [item['id'] for item in items])
+        response = get({'pathParameters': {'id': ids[0]},
+                        'queryStringParameters': {'fields': 'id,text'}},
+                       None)
+        self.assertEqual({'id': ids[0], 'text': self.text},
+                         json.loads(response['body']))
+        response = list_todos({'queryStringParameters': {
+            'fields': 'id,lang'}}, None)
+        self.assertEqual(400, response['statusCode'])
+        response = get({'pathParameters': {'id': ids[0]},
+                        'queryStringParameters': {'fields': ','}}, None)
+        self.assertEqual(400, response['statusCode'])
+        print ('End: test_list_fields')
+
+    def test_etag_compression(self):
+        print ('---------------------')
+        print ('Start: test_etag_compression')
+        import gzip
+        import base64
+        from src.todoList import put_items
+        from src.todoList import update_item
+        from src.list import list as list_todos
+        from src.get import get
+        from src.create import create
+        ids = [r['id'] for r in put_items([self.text] * 40, self.dynamodb)]
+        event = {'queryStringParameters': None,
+                 'headers': {'Accept-Encoding': 'gzip, deflate'}}
+        response = list_todos(event, None)
+        self.assertEqual(200, response['statusCode'])
+        self.assertTrue(response['isBase64Encoded'])
+        self.assertEqual('gzip', response['headers']['Content-Encoding'])
+        items = json.loads(gzip.decompress(
+            base64.b64decode(response['body'])))
+        self.assertEqual(40, len(items))
+        # Con el mismo ETag la respuesta es un 304 sin cuerpo
+        etag = response['headers']['ETag']
+        event['headers']['If-None-Match'] = etag
+        self.assertEqual(304, list_todos(event, None)['statusCode'])
+        # El ETag cambia al modificar un item o pedir otros campos
+        event['queryStringParameters'] = {'fields': 'id,checked'}
+        self.assertEqual(200, list_todos(event, None)['statusCode'])
+        event['queryStringParameters'] = None
+        update_item(ids[0], "Nuevo texto", "true", self.dynamodb)
+        response = list_todos(event, None)
+        self.assertEqual(200, response['statusCode'])
+        self.assertNotEqual(etag, response['headers']['ETag'])
+        # get usa la version del item, la misma que espera If-Match
+        event = {'pathParameters': {'id': ids[1]},
+                 'headers': {'if-none-match': 'W/"1"'}}
+        self.assertEqual(304, get(event, None)['statusCode'])
+        event['headers'] = {'Accept-Encoding': 'identity'}
+        response = get(event, None)
+        self.assertEqual(200, response['statusCode'])
+        self.assertEqual('"1"', response['headers']['ETag'])
+        self.assertNotIn('isBase64Encoded', response)
+        # Guardar el lenguaje detectado cambia el ETag, no la version
+        from src.todoList import get_item
+        from src.todoList import set_item_language
+        from src.update import update
+        set_item_language(get_item(ids[1], self.dynamodb), 'es',
+                          self.dynamodb)
+        event['headers'] = {'If-None-Match': '"1"'}
+        response = get(event, None)
+        self.assertEqual(200, response['statusCode'])
+        self.assertEqual('"1-es"', response['headers']['ETag'])
+        response = update({'pathParameters': {'id': ids[1]},
+                           'body': json.dumps({'text': self.text,
+                                               'checked': False}),
+                           'headers': {'If-Match': '"1-es"'}}, None)
+        self.assertEqual('"2"', response['headers']['ETag'])
+        # Cuerpos en base64 con BinaryMediaTypes
+        body = base64.b64encode(json.dumps({'text': self.text}).encode())
+        response = create({'body': body.decode(), 'isBase64Encoded': True},
+                          None)
+        self.assertEqual(200, response['statusCode'])
+        print ('End: test_etag_compression')
+
 #  ------------------------------ PRUEBAS TRANSLATE INICIO ------------------------------
     # Testeo Obtener Lenguaje
     def test_get_languaje(self):
@@ -313,6 +1243,197 @@ class TestDatabaseFunctions(unittest.TestCase):
             responseTranslate['text'])
         print ('End: test_translate_item')
 
+    # Testeo cache de traducciones
+    def test_translate_item_cached(self):
+        print ('---------------------')
+        print ('Start: test_translate_item_cached')
+        from src.todoList import translate_item
+        from src.todoList import put_item
+        from src.todoList import get_item
+        from src.todoList import update_item
+        os.environ['TRANSLATIONS_TABLE'] = 'translationsUnitTestsTable'
+        try:
+            translationcache.create_translations_table(self.dynamodb)
+            responsePut = put_item(self.text, self.dynamodb)
+            idItem = json.loads(responsePut['body'])['id']
+            item = get_item(idItem, self.dynamodb)
+            translationcache.put(item, self.dest_lang, self.traduccion,
+                                 self.dynamodb)
+            # Sin cache en memoria se lee de la tabla de traducciones
+            translationcache.clear()
+            responseTranslate = translate_item(
+                    idItem,
+                    self.dest_lang,
+                    self.dynamodb)
+            self.assertEqual(self.traduccion, responseTranslate['text'])
+            # Al editar el item la traduccion deja de ser valida
+            item = update_item(idItem, self.text, True, self.dynamodb)
+            self.assertIsNone(
+                translationcache.get(item, self.dest_lang, self.dynamodb))
+        finally:
+            del os.environ['TRANSLATIONS_TABLE']
+        print ('End: test_translate_item_cached')
+
+    # Testeo lenguaje guardado en el item
+    def test_translate_item_stored_language(self):
+        print ('---------------------')
+        print ('Start: test_translate_item_stored_language')
+        from src.todoList import translate_item
+        from src.todoList import put_item
+        from src.todoList import get_item
+        from src.todoList import update_item
+        from src.todoList import set_item_language
+        responsePut = put_item(self.text, self.dynamodb)
+        idItem = json.loads(responsePut['body'])['id']
+        item = get_item(idItem, self.dynamodb)
+        set_item_language(item, self.origin_lang, self.dynamodb)
+        self.assertEqual(self.origin_lang,
+                         get_item(idItem, self.dynamodb)['lang'])
+        # Mismo lenguaje origen y destino: no se llama a ningun servicio
+        responseTranslate = translate_item(
+                idItem,
+                self.origin_lang,
+                self.dynamodb)
+        self.assertEqual(self.text, responseTranslate['text'])
+        # Al cambiar el texto se descarta el lenguaje guardado
+        updated = update_item(idItem, self.traduccion, False, self.dynamodb)
+        self.assertNotIn('lang', updated)
+        # Un lenguaje detectado sobre un texto anterior no se guarda
+        self.assertIsNone(set_item_language(item, "es", self.dynamodb))
+        print ('End: test_translate_item_stored_language')
+
+    # Testeo traduccion masiva (clientes simulados, sin red)
+    def test_translate_items(self):
+        print ('---------------------')
+        print ('Start: test_translate_items')
+        from src.todoList import translate_items
+        from src.todoList import put_items
+        from src.todoList import get_item
+        traduccion = self.traduccion
+
+        class Comprehend:
+            calls = []
+
+            def batch_detect_dominant_language(self, TextList):
+                Comprehend.calls.append(TextList)
+                return {'ResultList': [
+                    {'Index': i, 'Languages': [
+                        {'LanguageCode': 'en', 'Score': 0.1},
+                        {'LanguageCode': 'es', 'Score': 0.9}]}
+                    for i in range(len(TextList))], 'ErrorList': []}
+
+        class Translate:
+            def translate_text(self, Text, SourceLanguageCode,
+                               TargetLanguageCode):
+                return {'TranslatedText': traduccion}
+
+        ids = [r['id'] for r in put_items([self.text] * 30, self.dynamodb)]
+        items, cursor = translate_items(self.dest_lang, ids, self.dynamodb,
+                                        Comprehend(), Translate())
+        self.assertIsNone(cursor)
+        self.assertEqual(ids, [item['id'] for item in items])
+        self.assertTrue(all(i['text'] == traduccion for i in items))
+        # Dos llamadas a Comprehend para 30 textos (lotes de 25)
+        self.assertEqual([25, 5], [len(c) for c in Comprehend.calls])
+        self.assertEqual(self.origin_lang,
+                         get_item(ids[0], self.dynamodb)['lang'])
+
+        from botocore.exceptions import ClientError
+
+        class PartialComprehend:
+            # El segundo texto falla en el lote y tambien de a uno
+            def batch_detect_dominant_language(self, TextList):
+                return {'ResultList': [{'Index': 0, 'Languages': [
+                            {'LanguageCode': 'es', 'Score': 0.9}]}],
+                        'ErrorList': [{'Index': 1, 'ErrorCode': 'Internal',
+                                       'ErrorMessage': 'error'}]}
+
+            def detect_dominant_language(self, Text):
+                raise ClientError({'Error': {'Code': 'InternalServerException',
+                                             'Message': 'error'}},
+                                  'DetectDominantLanguage')
+
+        more = [r['id'] for r in put_items([self.text] * 2, self.dynamodb)]
+        items, _ = translate_items(self.dest_lang, more, self.dynamodb,
+                                   PartialComprehend(), Translate())
+        self.assertEqual([traduccion, None], [i['text'] for i in items])
+        # Por paginas: el cursor sigue desde el ultimo id traducido
+        items, cursor = translate_items(self.dest_lang, ids, self.dynamodb,
+                                        Comprehend(), Translate(), limit=20)
+        self.assertEqual(ids[:20], [item['id'] for item in items])
+        page = cursor
+        items, cursor = translate_items(self.dest_lang, ids, self.dynamodb,
+                                        Comprehend(), Translate(), limit=20,
+                                        cursor=page)
+        self.assertEqual(ids[20:], [item['id'] for item in items])
+        self.assertIsNone(cursor)
+        # Toda la tabla por paginas del scan
+        found = []
+        cursor = None
+        while True:
+            items, cursor = translate_items(
+                self.dest_lang, None, self.dynamodb, Comprehend(),
+                Translate(), limit=7, cursor=cursor)
+            self.assertLessEqual(len(items), 7)
+            found.extend(item['id'] for item in items)
+            if cursor is None:
+                break
+        self.assertEqual(sorted(ids + more), sorted(found))
+        # Sin tiempo en la lambda se corta y el cursor no avanza
+        import awsclients
+
+        class Context:
+            def get_remaining_time_in_millis(self):
+                return 1000
+
+        handler = awsclients.deadline(lambda event, context: translate_items(
+            self.dest_lang, ids, self.dynamodb, Comprehend(), Translate(),
+            cursor=event))
+        self.assertEqual(([], page), handler(page, Context()))
+        from src.translate import translate_list
+        response = translate_list({'pathParameters': {
+            'language': self.dest_lang}, 'queryStringParameters': {
+            'ids': ','.join(ids), 'limit': '0'}}, None)
+        self.assertEqual(400, response['statusCode'])
+        print ('End: test_translate_items')
+
+    # Testeo presupuesto de latencia de la traduccion
+    def test_translate_item_budget(self):
+        print ('---------------------')
+        print ('Start: test_translate_item_budget')
+        from src.todoList import translate_item
+        from src.todoList import put_item
+        from src.translate import translate
+
+        class Context:
+            def get_remaining_time_in_millis(self):
+                return 100
+
+        responsePut = put_item(self.text, self.dynamodb)
+        idItem = json.loads(responsePut['body'])['id']
+        # Con el lenguaje origen indicado no se llama a Comprehend
+        responseTranslate = translate_item(
+                idItem,
+                self.origin_lang,
+                self.dynamodb,
+                source=self.origin_lang)
+        self.assertEqual(self.text, responseTranslate['text'])
+        # Con el origen indicado no se usa la cache del lenguaje detectado
+        from src.todoList import get_item
+        translationcache.put(get_item(idItem, self.dynamodb),
+                             self.origin_lang, 'cacheada', self.dynamodb)
+        responseTranslate = translate_item(
+                idItem,
+                self.origin_lang,
+                self.dynamodb,
+                source=self.origin_lang)
+        self.assertEqual(self.text, responseTranslate['text'])
+        # Sin tiempo restante la lambda responde 504 en lugar de expirar
+        response = translate({'pathParameters': {
+            'id': idItem, 'language': self.dest_lang}}, Context())
+        self.assertEqual(504, response['statusCode'])
+        print ('End: test_translate_item_budget')
+
 #  ------------------------------ PRUEBAS TRANSLATE FIN ------------------------------
 
 if __name__ == '__main__':